@@ -0,0 +1,308 @@
+"""Async serving mode for the TMS backend.
+
+Run from the backend directory:
+
+    uvicorn asgi:app --port 5000 --workers 4
+
+The public catalog routes, the booking history and confirm_booking are served
+here on an async SQLAlchemy engine (asyncpg for PostgreSQL, aiosqlite for
+SQLite), so a request waiting on the database holds no thread. They answer
+with the same JSON, status codes, ETags and CORS headers as the Flask routes
+in app.py. Every other route, and any request these handlers would not answer
+exactly as Flask does (no session cookie, malformed JSON, ...), is passed to
+the Flask app unchanged on a thread.
+
+Logins stay in Flask, and its signed session cookie authenticates the async
+routes too. Confirmation emails go through the same outbox as the sync app:
+the booking transaction queues them and the outbox worker threads send them,
+so no request waits on SMTP.
+
+Needs `pip install uvicorn asgiref greenlet` plus `asyncpg` or `aiosqlite`.
+"""
+import asyncio
+import json
+import time
+import urllib.parse
+from types import SimpleNamespace
+
+from asgiref.wsgi import WsgiToAsgi
+from flask_cors.core import get_cors_headers, get_cors_options
+from itsdangerous import BadSignature
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.http import parse_accept_header, parse_cookie, parse_etags, parse_options_header
+
+import app as tms
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_database_url(url):
+    """`url` rewritten to use the async driver for its database"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver is configured for {backend} databases.")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == 'postgresql' and 'sslmode' in url.query:
+        # asyncpg calls libpq's sslmode parameter "ssl"
+        url = url.update_query_dict({'ssl': url.query['sslmode']}).difference_update_query(['sslmode'])
+    return url
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the async routes read"""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']])
+        self.args = MultiDict(urllib.parse.parse_qsl(scope['query_string'].decode('utf-8', 'replace'),
+                                                     keep_blank_values=True))
+        self.body = None
+        self.accept_encodings = parse_accept_header(self.headers.get('Accept-Encoding'))
+
+    async def read_body(self):
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        self.body = b''.join(chunks)
+        return self.body
+
+    def replay(self):
+        """A receive callable that hands an already-read body to the next app"""
+        if self.body is None:
+            return self.receive
+        pending = [{'type': 'http.request', 'body': self.body, 'more_body': False}]
+
+        async def receive():
+            return pending.pop() if pending else await self.receive()
+        return receive
+
+    def is_json(self):
+        mimetype, _ = parse_options_header(self.headers.get('Content-Type', ''))
+        return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+class AsyncCatalog:
+    """The async twin of get_catalog(): one CatalogSnapshot per catalog version.
+
+    It shares the process's cache_versions with the Flask routes, so a tour
+    write through Flask in this process shows up on the next request here.
+    """
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.snapshot = None
+        self.lock = asyncio.Lock()
+
+    def current(self):
+        """The snapshot, if it matches a recently checked version"""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == tms.recent_cache_version('catalog'):
+            return snapshot
+        return None
+
+    async def get(self):
+        snapshot = self.current()
+        if snapshot is not None:
+            return snapshot
+        async with self.lock:
+            snapshot = self.current()
+            if snapshot is not None:
+                return snapshot
+            async with self.sessions() as session:
+                version = await session.scalar(
+                    select(tms.CacheVersion.version).where(tms.CacheVersion.name == 'catalog')) or 0
+                if self.snapshot is None or self.snapshot.version != version:
+                    tours = await session.scalars(select(tms.Tour).order_by(tms.Tour.id))
+                    self.snapshot = tms.CatalogSnapshot(version, [tms.tour_to_dict(t) for t in tours])
+            tms.remember_cache_version('catalog', version)
+            return self.snapshot
+
+
+class AsyncTMS:
+    """ASGI app serving the hot public routes natively and everything else through Flask"""
+
+    def __init__(self, flask_app=None):
+        self.flask_app = flask_app or tms.app
+        self.wsgi = WsgiToAsgi(self.flask_app)
+        config = self.flask_app.config
+        self.engine = create_async_engine(async_database_url(config['SQLALCHEMY_DATABASE_URI']),
+                                          **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.catalog = AsyncCatalog(self.sessions)
+
+        self.session_cookie = config['SESSION_COOKIE_NAME']
+        self.session_max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+        self.session_serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        self.cors_options = get_cors_options(self.flask_app, tms.CORS_OPTIONS)
+
+        self.routes = {
+            ('GET', '/api/tours'): self.tours,
+            ('GET', '/api/packages/filter'): self.filter_packages,
+            ('GET', '/api/packages/facets'): self.package_facets,
+            ('GET', '/api/bookings/my_history'): self.my_history,
+            ('POST', '/api/confirm_booking'): self.confirm_booking,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        handler = self.routes.get((scope['method'], scope['path'])) if scope['type'] == 'http' else None
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        started = time.perf_counter()
+        request = AsyncRequest(scope, receive)
+        response = await handler(request)
+        if response is None:
+            return await self.wsgi(scope, request.replay(), send)
+
+        status, headers, body = self.compress(request, *response)
+        headers.extend(get_cors_headers(self.cors_options, request.headers, request.method).items(multi=True))
+        headers.append(('Content-Length', str(len(body))))
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(k.encode('latin-1'), str(v).encode('latin-1')) for k, v in headers]})
+        await send({'type': 'http.response.body', 'body': body})
+
+        tms.metrics.inc('tms_http_requests_total', method=request.method, route=request.path, status=status)
+        tms.metrics.observe('tms_http_request_duration_seconds', time.perf_counter() - started, route=request.path)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # --- RESPONSES ---
+    def compress(self, request, status, headers, body):
+        """What the compress_response hook would do to a JSON response"""
+        if status != 200 or len(body) < tms.COMPRESS_MIN_BYTES or any(k == 'Content-Encoding' for k, _ in headers):
+            return status, headers, body
+        headers.append(('Vary', 'Accept-Encoding'))
+        encoding = tms.negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return status, headers, body
+        return status, headers + [('Content-Encoding', encoding)], tms.compress_body(body, encoding)
+
+    def json_response(self, status, payload, *extra_headers):
+        """What jsonify(payload), status would send"""
+        body = self.flask_app.json.response(payload).get_data()
+        return status, [('Content-Type', 'application/json'), *extra_headers], body
+
+    async def catalog_response(self, request, key, build):
+        """What CatalogSnapshot.json_response() would send, 304 included"""
+        catalog = await self.catalog.get()
+        body, etag, encoding = catalog.cached_body(key, build, self.flask_app.json.dumps,
+                                                   tms.negotiate_encoding(request.accept_encodings))
+        headers = [('Vary', 'Accept-Encoding'), ('ETag', f'"{etag}"'), ('Cache-Control', 'no-cache')]
+        if encoding is not None:
+            headers.append(('Content-Encoding', encoding))
+        if parse_etags(request.headers.get('If-None-Match')).contains_weak(etag):
+            return 304, headers, b''
+        return 200, [('Content-Type', 'application/json'), *headers], body
+
+    def flask_session(self, request):
+        """The Flask session in the request cookie, or None when it is missing or forged"""
+        cookie = parse_cookie(request.headers.get('Cookie', '')).get(self.session_cookie)
+        if not cookie:
+            return None
+        try:
+            return self.session_serializer.loads(cookie, max_age=self.session_max_age)
+        except BadSignature:
+            return None
+
+    def stick_to_primary(self, request):
+        """The Set-Cookie header tms.stick_to_primary() would add to the Flask session"""
+        interface = self.flask_app.session_interface
+        session = interface.session_class(self.flask_session(request) or {})
+        session['primary_until'] = time.time() + tms.READ_YOUR_WRITES_SECONDS
+        response = self.flask_app.response_class()
+        interface.save_session(self.flask_app, session, response)
+        return [('Set-Cookie', cookie) for cookie in response.headers.getlist('Set-Cookie')]
+
+    async def current_user(self, request, session):
+        """The user of the Flask login session in the request cookie, or None"""
+        try:
+            user_id = int(self.flask_session(request)['_user_id'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        row = (await session.execute(
+            select(tms.User.id, tms.User.username).where(tms.User.id == user_id))).first()
+        return SimpleNamespace(id=row.id, username=row.username) if row else None
+
+    # --- ROUTES ---
+    async def tours(self, request):
+        try:
+            key, build = tms.tours_request(request.args)
+        except ValueError as e:
+            return self.json_response(400, {"message": str(e)})
+        return await self.catalog_response(request, key, build)
+
+    async def filter_packages(self, request):
+        try:
+            key, build = tms.package_filter_request(request.args)
+        except ValueError as e:
+            return self.json_response(400, {"message": str(e)})
+        return await self.catalog_response(request, key, build)
+
+    async def package_facets(self, request):
+        return await self.catalog_response(request, *tms.package_facets_request(request.args))
+
+    async def my_history(self, request):
+        async with self.sessions() as session:
+            user = await self.current_user(request, session)
+            if user is None:
+                return None
+            try:
+                stmt, limit, archived = tms.user_history_request(user.id, request.args)
+            except ValueError as e:
+                return self.json_response(400, {"message": f"Invalid filter: {e}"}, ('Vary', 'Cookie'))
+            rows = (await session.scalars(stmt)).all()
+        # Archive segments are listed through the sync session and read from disk, so off the loop
+        rows = await asyncio.to_thread(self.merge_archived, rows, limit, archived)
+        return self.json_response(200, tms.user_history_payload(rows, limit, user.username), ('Vary', 'Cookie'))
+
+    def merge_archived(self, rows, limit, archived):
+        with self.flask_app.app_context():
+            return tms.merge_archived(rows, limit, archived)
+
+    async def confirm_booking(self, request):
+        body = await request.read_body()
+        if not request.is_json():
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        async with self.sessions() as session:
+            user = await self.current_user(request, session)
+            if user is None:
+                return None
+            # book_package is the sync route's code; run_sync drives it on the
+            # async connection, so its queries still never block the loop.
+            payload, status = await session.run_sync(tms.book_package, user, data)
+        headers = [('Vary', 'Cookie')]
+        if status == 200:
+            headers += self.stick_to_primary(request)
+            with self.flask_app.app_context():
+                tms.wake_email_workers()
+        return self.json_response(status, payload, *headers)
+
+
+app = AsyncTMS()
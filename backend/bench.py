@@ -0,0 +1,1671 @@
+"""Benchmarks for the TMS backend.
+
+Run from the backend directory:
+
+    python bench.py coldstart [--runs 10] [--path /api/tours]
+    python bench.py search [--tours 100000] [--queries 2000]
+    python bench.py load [--concurrency 1,8,32] [--output report.json]
+                         [--compare baseline.json]
+    python bench.py capacity [--bookers 300] [--capacity 500]
+    python bench.py serving [--connections 16,128,512] [--duration 5]
+    python bench.py payload [--tours 2000] [--requests 200]
+    python bench.py normalize [--bookings 200000] [--batch-size 1000]
+    python bench.py archive [--bookings 200000] [--days 90]
+    python bench.py cancel [--travellers 20000] [--send-rate 200]
+    python bench.py login-flood [--flooders 16] [--duration 10]
+    python bench.py recommend [--bookings 1000000] [--refresh 100,1000,10000]
+
+Every benchmark builds its own throwaway SQLite database, so none of them
+touch the database configured in app.py. `load`, `capacity` and `serving`
+can also run against a Postgres database given with --database-url; it must
+be empty and disposable. `serving` needs uvicorn and the async drivers listed
+in asgi.py.
+"""
+import argparse
+import collections
+import http.client
+import itertools
+import json
+import os
+import random
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Timed inside a fresh interpreter: importing the app module, building the
+# app and answering the first request.
+COLDSTART_SNIPPET = """
+import time
+started = time.perf_counter()
+import app as tms
+response = tms.app.test_client().get({path!r})
+elapsed = time.perf_counter() - started
+assert response.status_code == 200, response.status_code
+print(elapsed)
+"""
+
+
+def summarize(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0], 1),
+        "median_ms": round(statistics.median(ordered), 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+def latency_percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 4)
+
+    return {"count": len(ordered), "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99)}
+
+
+def synthetic_words(rng, count):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(count)]
+
+
+def synthetic_tours(count, seed=42):
+    """Tours drawn from a Zipf-ish vocabulary so some words are common and most are rare"""
+    rng = random.Random(seed)
+    words = synthetic_words(rng, 20000)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    countries = synthetic_words(rng, 60)
+    tours = []
+    for tour_id in range(1, count + 1):
+        name = " ".join(rng.choices(words, weights, k=rng.randint(1, 3)))
+        tours.append({
+            "id": tour_id,
+            "name": f"{name} {tour_id}",
+            "location": rng.choice(words),
+            "country": rng.choice(countries),
+            "description": " ".join(rng.choices(words, weights, k=12)),
+            "price": round(rng.uniform(50, 5000), 2),
+            "image_path": f"/tour{tour_id}.webp",
+        })
+    return tours, words
+
+
+def typo(rng, word):
+    position = rng.randrange(len(word))
+    return word[:position] + word[position + 1:]
+
+
+def import_app(database_url="sqlite://"):
+    """Import app.py in this process against a throwaway database"""
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    import app as tms
+    return tms
+
+
+def run_flask(env, *args):
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", *args],
+                   cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+
+def coldstart(args):
+    """Import-to-first-response time of a fresh process"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        run_flask(env, "migrate")
+        run_flask(env, "seed")
+
+        samples = []
+        for _ in range(args.runs):
+            result = subprocess.run([sys.executable, "-c", COLDSTART_SNIPPET.format(path=args.path)],
+                                    cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True)
+            samples.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+
+    report = {"benchmark": "coldstart", "path": args.path, **summarize(samples)}
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def search(args):
+    """Build time and query latency of the in-memory tour search index"""
+    tms = import_app()
+
+    tours, words = synthetic_tours(args.tours)
+    started = time.perf_counter()
+    index = tms.TourSearchIndex(1, tours)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(7)
+    timings = {"search": [], "search_typo": [], "autocomplete": [], "autocomplete_typo": []}
+    for _ in range(args.queries):
+        word = rng.choice(words[:5000])
+        cases = {
+            "search": (index.search, f"{word} {rng.choice(words)}"),
+            "search_typo": (index.search, typo(rng, word)),
+            "autocomplete": (index.autocomplete, word[:rng.randint(2, len(word))]),
+            "autocomplete_typo": (index.autocomplete, typo(rng, word)[:6]),
+        }
+        for name, (lookup, query) in cases.items():
+            started = time.perf_counter()
+            lookup(query, 10)
+            timings[name].append((time.perf_counter() - started) * 1000)
+
+    report = {
+        "benchmark": "search",
+        "tours": args.tours,
+        "terms": len(index.impacts),
+        "build_seconds": round(build_seconds, 2),
+        **{name: latency_percentiles(samples) for name, samples in timings.items()},
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+# --- LOAD BENCHMARK ---
+BENCH_PASSWORD = "bench-password"
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib and throws every message away"""
+
+    def reply(self, *lines):
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 bench SMTP sink")
+        for line in self.rfile:
+            verb = line[:4].upper()
+            if verb == b"EHLO":
+                self.reply("250-bench", "250-AUTH PLAIN", "250 OK")
+            elif verb == b"AUTH":
+                self.reply("235 Authenticated")
+            elif verb == b"DATA":
+                self.reply("354 Go ahead")
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                with self.server.lock:
+                    self.server.delivered += 1
+                self.reply("250 Queued")
+            elif verb == b"QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.delivered = 0
+
+
+class QueryCounter:
+    """WSGI middleware counting SQL statements per request, grouped by the X-Bench-Route header"""
+
+    def __init__(self, wsgi_app, engine):
+        from sqlalchemy import event
+        self.wsgi_app = wsgi_app
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.queries = collections.Counter()
+        self.requests = collections.Counter()
+        event.listen(engine, "before_cursor_execute", self.count)
+
+    def count(self, *args):
+        if getattr(self.local, "queries", None) is not None:
+            self.local.queries += 1
+
+    def __call__(self, environ, start_response):
+        # Streamed responses keep querying while their body is iterated
+        self.local.queries = 0
+        try:
+            yield from self.wsgi_app(environ, start_response)
+        finally:
+            route = environ.get("HTTP_X_BENCH_ROUTE", "unlabelled")
+            with self.lock:
+                self.queries[route] += self.local.queries
+                self.requests[route] += 1
+            self.local.queries = None
+
+    def reset(self):
+        with self.lock:
+            self.queries.clear()
+            self.requests.clear()
+
+    def per_request(self, route):
+        with self.lock:
+            return round(self.queries[route] / self.requests[route], 2) if self.requests[route] else None
+
+
+class BenchClient:
+    """One keep-alive HTTP connection with its own cookie jar"""
+
+    def __init__(self, port, cookies=None):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.cookies = dict(cookies or {})
+
+    def request(self, method, path, body=None, route="unlabelled", headers=None):
+        headers = {"X-Bench-Route": route, **(headers or {})}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed the kept-alive connection; reconnect once
+                self.connection.close()
+                if attempt:
+                    raise
+        for header in response.headers.get_all("Set-Cookie") or ():
+            name, _, value = header.split(";", 1)[0].partition("=")
+            self.cookies[name] = value
+        return response.status, data
+
+    def close(self):
+        self.connection.close()
+
+
+def booking_request(rng, ctx):
+    tour = rng.choice(ctx["tours"])
+    persons = rng.randint(1, 6)
+    return ("POST", "/api/confirm_booking", {
+        "email": "bench@example.com",
+        "mobile": "9000000000",
+        "package_name": tour["name"],
+        "image_filename": tour["image_path"],
+        "location": tour["location"],
+        "country": tour["country"],
+        "persons": persons,
+        "price_per_person": tour["price"],
+        "total_price": round(tour["price"] * persons, 2),
+    })
+
+
+def filter_request(rng, ctx):
+    locations = ",".join(t["location"] for t in rng.sample(ctx["tours"], 3))
+    query = urlencode({"locations": locations, "max_price": 3000, "sort": "price_asc", "limit": 20})
+    return ("GET", f"/api/packages/filter?{query}", None)
+
+
+# scenario -> (who the client logs in as, request builder)
+LOAD_SCENARIOS = {
+    "login": (None, lambda rng, ctx: ("POST", "/api/login",
+                                      {"username": rng.choice(ctx["usernames"]), "password": BENCH_PASSWORD})),
+    "tours": (None, lambda rng, ctx: ("GET", "/api/tours", None)),
+    "packages_filter": (None, filter_request),
+    "confirm_booking": ("user", booking_request),
+    "my_history": ("user", lambda rng, ctx: ("GET", "/api/bookings/my_history?limit=20", None)),
+    "admin_bookings": ("admin", lambda rng, ctx: ("GET", "/api/admin/bookings?limit=100", None)),
+}
+
+
+def seed_load_data(tms, app, args):
+    """Fill an empty database with deterministic users, tours and bookings"""
+    from sqlalchemy import insert
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        tms.migrate_schema()
+        if tms.User.query.count() or tms.Tour.query.count():
+            sys.exit("bench.py load needs an empty database; it would mix its data with what is there")
+        tms.seed_admin()
+
+        tours, _ = synthetic_tours(args.tours, seed=args.seed)
+        tms.db.session.execute(insert(tms.Tour), [{k: v for k, v in t.items()} for t in tours])
+
+        # One hash for every user keeps seeding fast; logins still pay full bcrypt cost
+        password = tms.password_hasher.hash(BENCH_PASSWORD)
+        users = [{"username": f"bench{i}", "email": f"bench{i}@example.com", "phone": f"8{i:09d}",
+                  "password": password, "is_admin": False} for i in range(args.users)]
+        tms.db.session.execute(insert(tms.User), users)
+        user_ids = [uid for (uid,) in tms.db.session.query(tms.User.id).filter(tms.User.is_admin.is_(False))]
+
+        now = time.time()
+        for start in range(0, args.bookings, 5000):
+            rows = []
+            for _ in range(start, min(start + 5000, args.bookings)):
+                tour = rng.choice(tours)
+                persons = rng.randint(1, 6)
+                rows.append({
+                    "user_id": rng.choice(user_ids), "package_name": tour["name"],
+                    "image_path": tour["image_path"], "location": tour["location"],
+                    "country": tour["country"], "persons": persons,
+                    "price_per_person": tour["price"], "total_price": round(tour["price"] * persons, 2),
+                    "payment_mode": "UPI",
+                    "booking_date": tms.datetime.datetime.utcfromtimestamp(now - rng.uniform(0, 365 * 86400)),
+                })
+            tms.db.session.execute(insert(tms.Booking), rows)
+        for uid in user_ids:
+            tms.rebuild_booking_summary(uid)
+        tms.db.session.commit()
+        tms.rebuild_rollups()
+
+    return {"tours": tours, "usernames": [u["username"] for u in users], "sessions": {}}
+
+
+def session_cookies(port, ctx, role, index):
+    """Log a virtual user in once and reuse its session cookie across runs"""
+    key = (role, index)
+    if key not in ctx["sessions"]:
+        client = BenchClient(port)
+        username = "admin" if role == "admin" else ctx["usernames"][index % len(ctx["usernames"])]
+        password = "admin123" if role == "admin" else BENCH_PASSWORD
+        status, _ = client.request("POST", "/api/login", {"username": username, "password": password}, "setup")
+        assert status == 200, f"login as {username} failed with {status}"
+        ctx["sessions"][key] = client.cookies
+        client.close()
+    return ctx["sessions"][key]
+
+
+def drive(port, name, concurrency, total_requests, ctx, seed):
+    """Send `total_requests` requests of one scenario from `concurrency` clients"""
+    role, build = LOAD_SCENARIOS[name]
+    clients = [BenchClient(port, session_cookies(port, ctx, role, i) if role else None)
+               for i in range(concurrency)]
+    tickets = itertools.count()
+    start = threading.Barrier(concurrency + 1)
+    samples = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(i):
+        rng = random.Random(seed * 1000 + i)
+        client = clients[i]
+        for _ in range(3):
+            client.request(*build(rng, ctx), route="warmup")
+        start.wait()
+        while next(tickets) < total_requests:
+            method, path, body = build(rng, ctx)
+            began = time.perf_counter()
+            status, _ = client.request(method, path, body, route=name)
+            samples[i].append((time.perf_counter() - began) * 1000)
+            if status >= 400:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    for client in clients:
+        client.close()
+
+    latencies = [sample for worker_samples in samples for sample in worker_samples]
+    return {
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **latency_percentiles(latencies),
+        "errors": sum(errors),
+    }
+
+
+def compare_reports(baseline, report, tolerance):
+    """Regressions of `report` against `baseline`, as readable lines"""
+    regressions = []
+    for name, levels in report["results"].items():
+        for level, current in levels.items():
+            base = baseline.get("results", {}).get(name, {}).get(level)
+            if base is None:
+                continue
+            label = f"{name} @ concurrency {level}"
+            if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{label}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{label}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+            # Query counts are deterministic, so any growth is a real regression
+            if (current["queries_per_request"] or 0) > (base["queries_per_request"] or 0) + 0.05:
+                regressions.append(f"{label}: queries/request {base['queries_per_request']} -> "
+                                   f"{current['queries_per_request']}")
+            if current["errors"] > base["errors"]:
+                regressions.append(f"{label}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def bench_app(database_url, bcrypt_rounds):
+    """Import app.py against `database_url` with its SMTP pointed at a local sink"""
+    tms = import_app(database_url)
+    tms.BCRYPT_LOG_ROUNDS = bcrypt_rounds
+    config = {"BCRYPT_LOG_ROUNDS": bcrypt_rounds}
+    if database_url.startswith("sqlite"):
+        # Writers queue on SQLite's file lock instead of failing after 5s
+        config["SQLALCHEMY_ENGINE_OPTIONS"] = {**tms.engine_options(database_url), "connect_args": {"timeout": 60}}
+    app = tms.create_app(config)
+
+    sink = SMTPSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    tms.SMTP_SERVER, tms.SMTP_PORT = sink.server_address
+    tms.SMTP_USE_TLS = False
+    return tms, app, sink
+
+
+def serve(app):
+    """Serve `app` from a threaded keep-alive werkzeug server; returns the server"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load(args):
+    """Throughput, latency and queries per request of the main routes under concurrency"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        tms, app, sink = bench_app(database_url, args.bcrypt_rounds)
+
+        started = time.perf_counter()
+        ctx = seed_load_data(tms, app, args)
+        seed_seconds = time.perf_counter() - started
+
+        with app.app_context():
+            counter = QueryCounter(app.wsgi_app, tms.db.engine)
+        app.wsgi_app = counter
+        server = serve(app)
+        port = server.server_port
+
+        scenarios = args.scenarios.split(",") if args.scenarios else list(LOAD_SCENARIOS)
+        levels = [int(level) for level in args.concurrency.split(",")]
+        results = {}
+        for name in scenarios:
+            results[name] = {}
+            for level in levels:
+                counter.reset()
+                result = drive(port, name, level, args.requests, ctx, args.seed)
+                result["queries_per_request"] = counter.per_request(name)
+                results[name][str(level)] = result
+                print(f"{name:16} x{level:<3} {result['throughput_rps']:8.1f} req/s  "
+                      f"p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms  "
+                      f"{result['queries_per_request']} queries/req  {result['errors']} errors", file=sys.stderr)
+
+        server.shutdown()
+        time.sleep(0.5)  # let the outbox workers hand their last batch to the sink
+        sink.shutdown()
+
+    report = {
+        "benchmark": "load",
+        "database": database_url.split(":", 1)[0],
+        "seed": args.seed,
+        "users": args.users,
+        "tours": args.tours,
+        "bookings": args.bookings,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "requests_per_level": args.requests,
+        "seed_seconds": round(seed_seconds, 1),
+        "emails_delivered": sink.delivered,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    return report
+
+
+# --- CAPACITY STRESS TEST ---
+def capacity(args):
+    """Many concurrent bookers racing for one hot tour date; checks inventory never oversells"""
+    from sqlalchemy import func, insert
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'capacity.db')}"
+        tms, app, sink = bench_app(database_url, args.bcrypt_rounds)
+        travel_date = tms.datetime.date.today() + tms.datetime.timedelta(days=30)
+
+        with app.app_context():
+            tms.migrate_schema()
+            if tms.User.query.count() or tms.Tour.query.count():
+                sys.exit("bench.py capacity needs an empty database")
+            tour = tms.Tour(name="Hot Tour", location="Agra", country="India", description="Flash sale",
+                            price=100.0, image_path="/hot.webp")
+            tms.db.session.add(tour)
+            tms.db.session.flush()
+            tour_id = tour.id
+            password = tms.password_hasher.hash(BENCH_PASSWORD)
+            tms.db.session.execute(insert(tms.User), [
+                {"username": f"booker{i}", "email": f"booker{i}@example.com", "phone": f"7{i:09d}",
+                 "password": password, "is_admin": False} for i in range(args.bookers)])
+            tms.db.session.add(tms.TourSlot(tour_id=tour_id, travel_date=travel_date,
+                                            capacity=args.capacity, reserved=0))
+            tms.db.session.commit()
+
+        server = serve(app)
+        port = server.server_port
+        ctx = {"usernames": [f"booker{i}" for i in range(args.bookers)], "sessions": {}}
+        clients = [BenchClient(port, session_cookies(port, ctx, "user", i)) for i in range(args.bookers)]
+
+        def booking(rng, with_date):
+            persons = rng.randint(1, args.max_persons)
+            body = {"email": "booker@example.com", "mobile": "9000000000", "tour_id": tour_id,
+                    "package_name": "Hot Tour", "image_filename": "hot.webp", "location": "Agra",
+                    "country": "India", "persons": persons, "price_per_person": 100.0,
+                    "total_price": 100.0 * persons}
+            if with_date:
+                body["travel_date"] = travel_date.isoformat()
+            return body
+
+        def burst(with_date):
+            """Every booker fires `attempts` bookings at once; returns per-request outcomes"""
+            outcomes = [[] for _ in clients]
+            start = threading.Barrier(len(clients) + 1)
+
+            def booker(i):
+                rng = random.Random(args.seed * 1000 + i)
+                start.wait()
+                for _ in range(args.attempts):
+                    began = time.perf_counter()
+                    status, data = clients[i].request("POST", "/api/confirm_booking", booking(rng, with_date),
+                                                      route="confirm_booking")
+                    outcomes[i].append((status, (time.perf_counter() - began) * 1000, data))
+
+            threads = [threading.Thread(target=booker, args=(i,)) for i in range(len(clients))]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+            flat = [outcome for per_booker in outcomes for outcome in per_booker]
+            statuses = collections.Counter(status for status, _, _ in flat)
+            return outcomes, {
+                "requests": len(flat),
+                "throughput_rps": round(len(flat) / elapsed, 1),
+                **latency_percentiles([ms for _, ms, _ in flat]),
+                "confirmed": statuses[200],
+                "sold_out": statuses[409],
+                "errors": sum(n for status, n in statuses.items() if status not in (200, 409)),
+            }
+
+        # Watch the slot from another connection while the hot burst runs
+        lowest_remaining = [args.capacity]
+        watching = threading.Event()
+
+        def watch():
+            with app.app_context():
+                while not watching.is_set():
+                    remaining = tms.db.session.query(tms.TourSlot.capacity - tms.TourSlot.reserved).scalar()
+                    lowest_remaining[0] = min(lowest_remaining[0], remaining)
+                    tms.db.session.rollback()
+                    time.sleep(0.005)
+
+        _, unlimited = burst(with_date=False)
+        watcher = threading.Thread(target=watch)
+        watcher.start()
+        outcomes, hot = burst(with_date=True)
+
+        # Cancel half of the confirmed hot bookings concurrently, which must hand the places back
+        confirmed = [(i, json.loads(data)["id"]) for i, per_booker in enumerate(outcomes)
+                     for status, _, data in per_booker if status == 200]
+        to_cancel = confirmed[::2]
+        cancel_threads = [threading.Thread(target=lambda i=i, booking_id=booking_id: clients[i].request(
+            "DELETE", f"/api/bookings/{booking_id}", route="cancel")) for i, booking_id in to_cancel]
+        for thread in cancel_threads:
+            thread.start()
+        for thread in cancel_threads:
+            thread.join()
+        watching.set()
+        watcher.join()
+
+        with app.app_context():
+            slot = tms.TourSlot.query.one()
+            booked_persons = tms.db.session.query(func.coalesce(func.sum(tms.Booking.persons), 0)).filter(
+                tms.Booking.slot_id == slot.id).scalar()
+            booked_rows = tms.Booking.query.filter(tms.Booking.slot_id == slot.id).count()
+            reserved, slot_capacity = slot.reserved, slot.capacity
+        for client in clients:
+            client.close()
+        server.shutdown()
+        sink.shutdown()
+
+    invariants = {
+        "never_oversold": lowest_remaining[0] >= 0 and reserved <= slot_capacity,
+        "reserved_matches_bookings": reserved == booked_persons,
+        "confirmed_matches_rows": hot["confirmed"] - len(to_cancel) == booked_rows,
+    }
+    report = {
+        "benchmark": "capacity",
+        "database": database_url.split(":", 1)[0],
+        "bookers": args.bookers,
+        "attempts_per_booker": args.attempts,
+        "capacity": args.capacity,
+        "unlimited": unlimited,
+        "hot_slot": hot,
+        "cancelled": len(to_cancel),
+        "reserved_after_cancel": reserved,
+        "lowest_remaining_seen": lowest_remaining[0],
+        "invariants": invariants,
+    }
+    print(json.dumps(report, indent=2))
+    if not all(invariants.values()):
+        sys.exit(1)
+    return report
+
+
+# --- SYNC VS ASYNC SERVING ---
+SERVING_SCENARIOS = ("tours", "packages_filter", "my_history", "confirm_booking")
+
+
+def bench_server(args):
+    """Run one server for `serving` and print its port (started by `serving` itself)"""
+    import socket
+
+    tms, app, sink = bench_app(args.database_url, args.bcrypt_rounds)
+    if args.mode == "sync":
+        server = serve(app)
+        print(server.server_port, flush=True)
+        threading.Event().wait()
+        return
+
+    import uvicorn
+    from asgi import AsyncTMS
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    print(sock.getsockname()[1], flush=True)
+    # Connections that warmed up early wait idle for the rest; keep them open like werkzeug does
+    config = uvicorn.Config(AsyncTMS(app), log_level="warning", access_log=False, backlog=4096,
+                            timeout_keep_alive=120)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def start_bench_server(mode, database_url, bcrypt_rounds, env=None):
+    """Start a `bench_server` process pinned to the first CPU; returns (process, port)"""
+    def pin():
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "server", "--mode", mode,
+         "--database-url", database_url, "--bcrypt-rounds", str(bcrypt_rounds)],
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True, preexec_fn=pin, env={**os.environ, **(env or {})})
+    return process, int(process.stdout.readline())
+
+
+def process_stats(pid):
+    """CPU seconds, thread count and resident MiB of a process, from /proc"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"),
+        "threads": int(status["Threads"]),
+        "rss_mib": int(status["VmRSS"].split()[0]) / 1024,
+    }
+
+
+async def read_http_response(reader):
+    """Status of one HTTP/1.1 response, and whether the server will close the connection"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding":
+            chunked = "chunked" in value
+        elif name == "connection":
+            close = value == "close"
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, close
+
+
+def flood(port, pid, name, connections, duration, ctx, seed):
+    """Keep `connections` keep-alive connections busy with one scenario for `duration` seconds"""
+    import asyncio
+
+    role, build = LOAD_SCENARIOS[name]
+    cookies = [session_cookies(port, ctx, role, i) if role else {} for i in range(connections)]
+    samples = []
+    errors = [0]
+    served = set()
+
+    async def client(i, start, window, warmed):
+        rng = random.Random(seed * 1000 + i)
+        cookie = "; ".join(f"{k}={v}" for k, v in cookies[i].items())
+        stream = []
+
+        async def exchange():
+            if not stream:
+                stream.extend(await asyncio.open_connection("127.0.0.1", port))
+            reader, writer = stream
+            method, path, body = build(rng, ctx)
+            payload = json.dumps(body).encode() if body is not None else b""
+            head = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", f"Content-Length: {len(payload)}"]
+            if cookie:
+                head.append(f"Cookie: {cookie}")
+            if body is not None:
+                head.append("Content-Type: application/json")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+            status, close = await read_http_response(reader)
+            if close:
+                writer.close()
+                stream.clear()
+            return status
+
+        try:
+            await exchange()  # connect and warm up before the clock starts
+        except (OSError, asyncio.IncompleteReadError):
+            stream.clear()
+        warmed.append(i)
+        await start.wait()
+        while time.perf_counter() < window["deadline"]:
+            began = time.perf_counter()
+            try:
+                status = await exchange()
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors[0] += 1
+                if stream:
+                    stream[1].close()
+                stream.clear()
+                await asyncio.sleep(0.01)
+                continue
+            if time.perf_counter() <= window["deadline"]:
+                samples.append((time.perf_counter() - began) * 1000)
+                served.add(i)
+                if status >= 400:
+                    errors[0] += 1
+        if stream:
+            stream[1].close()
+
+    async def run():
+        start = asyncio.Event()
+        window = {}
+        warmed = []
+        tasks = [asyncio.create_task(client(i, start, window, warmed)) for i in range(connections)]
+        while len(warmed) < connections:
+            await asyncio.sleep(0.05)
+        before = process_stats(pid)
+        window["deadline"] = time.perf_counter() + duration
+        start.set()
+        await asyncio.sleep(duration)
+        after = process_stats(pid)
+        await asyncio.gather(*tasks)
+        return before, after
+
+    before, after = asyncio.run(run())
+    cpu_seconds = after["cpu_seconds"] - before["cpu_seconds"]
+    return {
+        "throughput_rps": round(len(samples) / duration, 1),
+        "requests_per_cpu_second": round(len(samples) / cpu_seconds, 1) if cpu_seconds else None,
+        "server_cpu_seconds": round(cpu_seconds, 2),
+        "connections_served": len(served),
+        **latency_percentiles(samples),
+        "errors": errors[0],
+        "server_threads": after["threads"],
+        "server_rss_mib": round(after["rss_mib"], 1),
+    }
+
+
+def serving(args):
+    """The sync Flask server against the async server in asgi.py, one server CPU each"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'serving.db')}"
+        tms, app, sink = bench_app(database_url, args.bcrypt_rounds)
+        ctx = seed_load_data(tms, app, args)
+        sink.shutdown()
+
+        scenarios = args.scenarios.split(",") if args.scenarios else list(SERVING_SCENARIOS)
+        levels = [int(level) for level in args.connections.split(",")]
+        results = {}
+        for mode in ("sync", "async"):
+            process, port = start_bench_server(mode, database_url, args.bcrypt_rounds)
+            try:
+                for name in scenarios:
+                    for level in levels:
+                        result = flood(port, process.pid, name, level, args.duration, ctx, args.seed)
+                        results.setdefault(name, {}).setdefault(str(level), {})[mode] = result
+                        print(f"{mode:5} {name:16} x{level:<4} {result['throughput_rps']:8.1f} req/s  "
+                              f"{result['requests_per_cpu_second'] or 0:8.1f} req/cpu-s  "
+                              f"p50 {result['p50_ms'] or 0:8.2f}  p99 {result['p99_ms'] or 0:8.2f} ms  "
+                              f"{result['connections_served']:4} served  {result['errors']} errors  "
+                              f"{result['server_threads']} threads  {result['server_rss_mib']} MiB", file=sys.stderr)
+            finally:
+                process.terminate()
+                process.wait()
+
+    report = {
+        "benchmark": "serving",
+        "database": database_url.split(":", 1)[0],
+        "cpus": os.cpu_count(),
+        "server_cpus": 1,
+        "seed": args.seed,
+        "users": args.users,
+        "tours": args.tours,
+        "bookings": args.bookings,
+        "duration_seconds": args.duration,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+# Route -> (path, fields= projection a list view needs, login as admin)
+PAYLOAD_ROUTES = {
+    "tours": ("/api/tours", "id,name,location,country,price,image", False),
+    "admin_tours": ("/api/admin/tours", "id,name,location,country,price,image_path", True),
+    "packages_filter": ("/api/packages/filter?sort=price_asc&limit=100", "id,name,location,country,price,image",
+                        False),
+}
+
+# Variant -> (JSON provider, Accept-Encoding, use the projection)
+PAYLOAD_VARIANTS = {
+    "before": ("default", None, False),
+    "orjson": ("orjson", None, False),
+    "orjson+gzip": ("orjson", "gzip", False),
+    "orjson+br": ("orjson", "br", False),
+    "after": ("orjson", "br, gzip", True),
+}
+
+
+def payload(args):
+    """Response bytes and latency of the catalog routes by JSON encoder, compression and fields="""
+    from flask.json.provider import DefaultJSONProvider
+    from sqlalchemy import insert
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tms = import_app(f"sqlite:///{os.path.join(tmp, 'payload.db')}")
+        tms.BCRYPT_LOG_ROUNDS = 4
+        app = tms.create_app({"BCRYPT_LOG_ROUNDS": 4})
+        with app.app_context():
+            tms.migrate_schema()
+            tms.seed_admin()
+            tours, _ = synthetic_tours(args.tours, seed=args.seed)
+            tms.db.session.execute(insert(tms.Tour), tours)
+            tms.db.session.commit()
+
+        providers = {"default": DefaultJSONProvider(app)}
+        if tms.orjson is not None:
+            providers["orjson"] = tms.OrjsonProvider(app)
+        client = app.test_client()
+        response = client.post("/api/login", json={"username": "admin", "password": "admin123"})
+        assert response.status_code == 200, f"admin login failed with {response.status_code}"
+        response.close()
+
+        def get(path, accept_encoding):
+            headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            body = response.get_data()
+            elapsed = (time.perf_counter() - started) * 1000
+            response.close()
+            assert response.status_code == 200, (path, response.status_code)
+            return body, response.headers.get("Content-Encoding"), elapsed
+
+        results = {}
+        for route, (path, fields, _) in PAYLOAD_ROUTES.items():
+            for variant, (provider, accept_encoding, project) in PAYLOAD_VARIANTS.items():
+                if provider not in providers or (accept_encoding == "br" and tms.brotli is None):
+                    continue
+                app.json = providers[provider]
+                url = f"{path}{'&' if '?' in path else '?'}fields={fields}" if project else path
+                body, encoding, _ = get(url, accept_encoding)
+                # Cold: the catalog snapshot has to serialize (and compress) the response again,
+                # as it does after every tour write. Warm: served from the snapshot's cache.
+                cold, warm = [], []
+                for _ in range(args.requests):
+                    tms.catalog_snapshot.responses.clear()
+                    tms.catalog_snapshot.compressed.clear()
+                    cold.append(get(url, accept_encoding)[2])
+                for _ in range(args.requests):
+                    warm.append(get(url, accept_encoding)[2])
+                result = {"bytes": len(body), "encoding": encoding, "fields": fields if project else None,
+                          "cold": latency_percentiles(cold), "warm": latency_percentiles(warm)}
+                results.setdefault(route, {})[variant] = result
+                print(f"{route:16} {variant:12} {len(body):9} bytes  {encoding or 'identity':8}  "
+                      f"cold p50 {result['cold']['p50_ms']:7.3f} ms  warm p50 {result['warm']['p50_ms']:7.3f} ms",
+                      file=sys.stderr)
+        app.json = providers["default"]
+
+    report = {
+        "benchmark": "payload",
+        "tours": args.tours,
+        "requests": args.requests,
+        "seed": args.seed,
+        "orjson": tms.orjson is not None,
+        "brotli": tms.brotli is not None,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def table_bytes(tms, table):
+    """(bytes, rows) of a SQLite table, from the dbstat page statistics"""
+    connection = tms.db.session.connection()
+    size = connection.exec_driver_sql(f"SELECT sum(pgsize) FROM dbstat WHERE name = '{table}'").scalar()
+    rows = connection.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+    return size, rows
+
+
+def normalize(args):
+    """Bookings table size and booking-list query time before and after linking bookings to tours"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tms, app, sink = bench_app(f"sqlite:///{os.path.join(tmp, 'normalize.db')}", 4)
+        # seed_load_data writes bookings the old way: copied tour details, no tour_id
+        ctx = seed_load_data(tms, app, args)
+        sink.shutdown()
+        rng = random.Random(args.seed)
+        probes = [rng.choice(ctx["tours"]) for _ in range(args.queries)]
+        users = ctx["usernames"][:args.queries]
+
+        client = app.test_client()
+        response = client.post("/api/login", json={"username": "admin", "password": "admin123"})
+        assert response.status_code == 200, f"admin login failed with {response.status_code}"
+        response.close()
+
+        def timed(paths):
+            samples = []
+            for path in paths:
+                started = time.perf_counter()
+                response = client.get(path)
+                response.get_data()
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, (path, response.status_code)
+                response.close()
+            return latency_percentiles(samples)
+
+        def measure(per_tour_path):
+            with app.app_context():
+                tms.db.session.execute(tms.text("VACUUM"))
+                size, rows = table_bytes(tms, "bookings")
+            return {
+                "table_bytes": size,
+                "bytes_per_row": round(size / rows, 1),
+                "bookings_of_a_tour": timed(per_tour_path(t) for t in probes),
+                "admin_bookings_page": timed("/api/admin/bookings?limit=50" for _ in probes),
+                "bookings_of_a_user": timed(f"/api/admin/bookings?user={u}&limit=50" for u in users),
+            }
+
+        before = measure(lambda t: f"/api/admin/bookings?{urlencode({'package': t['name']})}&limit=50")
+        with app.app_context():
+            started = time.perf_counter()
+            linked, unmatched = tms.backfill_booking_tours(args.batch_size)
+            backfill_seconds = time.perf_counter() - started
+        after = measure(lambda t: f"/api/admin/bookings?tour_id={t['id']}&limit=50")
+
+    batches = -(-args.bookings // args.batch_size)
+    report = {
+        "benchmark": "normalize",
+        "bookings": args.bookings,
+        "tours": args.tours,
+        "queries": args.queries,
+        "backfill": {
+            "linked": linked,
+            "unmatched": unmatched,
+            "batch_size": args.batch_size,
+            "seconds": round(backfill_seconds, 2),
+            "mean_batch_ms": round(backfill_seconds * 1000 / batches, 2),
+        },
+        "before": before,
+        "after": after,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def archive(args):
+    """Table size, archive size and booking-list latency before and after archiving old bookings"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tms, app, sink = bench_app(f"sqlite:///{os.path.join(tmp, 'archive.db')}", 4)
+        tms.ARCHIVE_FOLDER = os.path.join(tmp, "archive")
+        # Bookings are spread over the past year, so --days 90 archives about three quarters of them
+        ctx = seed_load_data(tms, app, args)
+        sink.shutdown()
+        with app.app_context():
+            # A few old bookings whose trip is still ahead have to stay in the table
+            future = tms.datetime.date.today() + tms.datetime.timedelta(days=30)
+            old = tms.db.session.query(tms.Booking).order_by(tms.Booking.booking_date).limit(20).all()
+            for booking in old:
+                booking.travel_date = future
+            tms.db.session.commit()
+        users = ctx["usernames"][:args.queries]
+
+        client = app.test_client()
+        response = client.post("/api/login", json={"username": "admin", "password": "admin123"})
+        assert response.status_code == 200, f"admin login failed with {response.status_code}"
+        response.close()
+
+        def get(path):
+            started = time.perf_counter()
+            response = client.get(path)
+            body = response.get_data()
+            elapsed = (time.perf_counter() - started) * 1000
+            assert response.status_code == 200, (path, response.status_code)
+            response.close()
+            return body, elapsed
+
+        def walk(path):
+            """Every page of a paginated list, following next_cursor"""
+            pages, cursor = [], None
+            while True:
+                body, _ = get(path + (f"&cursor={cursor}" if cursor else ""))
+                pages.append(body)
+                cursor = json.loads(body)["next_cursor"]
+                if not cursor:
+                    return pages
+
+        def snapshot():
+            """Everything the archive must leave unchanged"""
+            with app.app_context():
+                tms.rebuild_rollups()
+                rollups = sorted((r.period, r.dimension, str(r.period_start), r.key, r.bookings, r.persons,
+                                  round(r.revenue, 2)) for r in tms.BookingRollup.query)
+                summaries = [(s.booking_count, round(s.total_spent, 2), str(s.last_trip_date), s.last_trip_package)
+                             for s in (tms.rebuild_booking_summary(uid) for uid in range(1, 30))]
+                tms.db.session.rollback()
+            return {
+                "history": [get(f"/api/admin/bookings?user={u}")[0] for u in users[:10]],
+                "history_pages": [walk(f"/api/admin/bookings?user={u}&limit=7") for u in users[:5]],
+                "admin_pages": walk("/api/admin/bookings?limit=500&date_from=2000-01-01"),
+                "export": get("/api/admin/bookings?format=ndjson")[0],
+                "rollups": rollups,
+                "summaries": summaries,
+            }
+
+        def measure():
+            with app.app_context():
+                tms.db.session.execute(tms.text("VACUUM"))
+                size, rows = table_bytes(tms, "bookings")
+            return {
+                "table_rows": rows,
+                "table_bytes": size,
+                "admin_first_page": latency_percentiles(
+                    [get("/api/admin/bookings?limit=50")[1] for _ in range(args.queries)]),
+                "user_recent_page": latency_percentiles(
+                    [get(f"/api/admin/bookings?user={u}&limit=10")[1] for u in users]),
+                "user_full_history": latency_percentiles(
+                    [get(f"/api/admin/bookings?user={u}")[1] for u in users]),
+                "old_month_page": latency_percentiles(
+                    [get(f"/api/admin/bookings?limit=50&date_from={old_month}&date_to={old_month[:8]}28")[1]
+                     for _ in range(args.queries)]),
+            }
+
+        old_month = (tms.datetime.date.today() - tms.datetime.timedelta(days=300)).replace(day=1).isoformat()
+        before, expected = measure(), snapshot()
+        with app.app_context():
+            started = time.perf_counter()
+            archived = tms.archive_bookings(args.days)
+            archive_seconds = time.perf_counter() - started
+        after = measure()
+        identical = {name: value == expected[name] for name, value in snapshot().items()}
+        segment_bytes = sum(entry.stat().st_size for entry in os.scandir(tms.ARCHIVE_FOLDER))
+
+    report = {
+        "benchmark": "archive",
+        "bookings": args.bookings,
+        "archive_after_days": args.days,
+        "archived": archived,
+        "archive_seconds": round(archive_seconds, 2),
+        "segment_bytes": segment_bytes,
+        "identical_results": identical,
+        "before": before,
+        "after": after,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not all(identical.values()):
+        sys.exit("archived bookings changed what the booking lists return")
+    return report
+
+
+def cancel(args):
+    """Cancelling a tour's bookings one request at a time versus one bulk cancellation, and the notice fan-out"""
+    from sqlalchemy import insert
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tms, app, sink = bench_app(f"sqlite:///{os.path.join(tmp, 'cancel.db')}", 4)
+        tms.EMAIL_SEND_RATE = args.send_rate
+        args.users = args.travellers
+        ctx = seed_load_data(tms, app, args)
+        rng = random.Random(args.seed)
+        with app.app_context():
+            tms.backfill_booking_tours()
+            tour = tms.Tour.query.filter_by(name=ctx["tours"][0]["name"]).one()
+            today = tms.datetime.date.today()
+            days = [today + tms.datetime.timedelta(days=d) for d in range(1, 31)]
+            tms.set_slot_capacity(tour.id, days, 10 ** 6)
+            slots = dict(tms.db.session.query(tms.TourSlot.travel_date, tms.TourSlot.id).filter_by(tour_id=tour.id))
+            user_ids = [uid for (uid,) in tms.db.session.query(tms.User.id).filter(tms.User.is_admin.is_(False))]
+            # Every traveller has one booking on the tour, some have two
+            travellers = user_ids + rng.sample(user_ids, args.tour_bookings - len(user_ids))
+            now = tms.datetime.datetime.utcnow()
+            rows, reserved = [], collections.Counter()
+            for uid in travellers:
+                day, persons = rng.choice(days), rng.randint(1, 4)
+                reserved[day] += persons
+                rows.append({"user_id": uid, "tour_id": tour.id, "persons": persons, "price_per_person": tour.price,
+                             "total_price": round(tour.price * persons, 2), "payment_mode": "UPI",
+                             "booking_date": now - tms.datetime.timedelta(seconds=rng.uniform(0, 30 * 86400)),
+                             "travel_date": day, "slot_id": slots[day]})
+            tms.db.session.execute(insert(tms.Booking), rows)
+            for day, persons in reserved.items():
+                tms.db.session.get(tms.TourSlot, slots[day]).reserved = persons
+            for uid in user_ids:
+                tms.rebuild_booking_summary(uid)
+            tms.db.session.commit()
+            tms.rebuild_rollups()
+            sample = [bid for (bid,) in tms.db.session.query(tms.Booking.id).filter_by(tour_id=tour.id)
+                      .order_by(tms.Booking.id).limit(args.single)]
+
+        client = app.test_client()
+        response = client.post("/api/login", json={"username": "admin", "password": "admin123"})
+        assert response.status_code == 200, f"admin login failed with {response.status_code}"
+        response.close()
+
+        started = time.perf_counter()
+        for booking_id in sample:
+            response = client.delete(f"/api/bookings/{booking_id}")
+            assert response.status_code == 200, (booking_id, response.status_code)
+            response.close()
+        single_seconds = time.perf_counter() - started
+
+        with app.app_context():
+            remaining = tms.Booking.query.filter_by(tour_id=tour.id).count()
+        started = time.perf_counter()
+        response = client.post("/api/admin/bookings/cancel", json={"tour_id": tour.id, "reason": "bench"})
+        bulk_seconds = time.perf_counter() - started
+        assert response.status_code == 200, response.status_code
+        cancellation = response.get_json()
+        response.close()
+
+        # The workers drain the outbox in the background; sample the progress endpoint
+        progress, connections_before = [], sink.connections
+        started = time.perf_counter()
+        while True:
+            response = client.get(f"/api/admin/bookings/cancellations/{cancellation['id']}")
+            state = response.get_json()
+            response.close()
+            progress.append((round(time.perf_counter() - started, 1), state["progress"]))
+            if state["done"]:
+                break
+            time.sleep(args.poll)
+        drain_seconds = time.perf_counter() - started
+
+        with app.app_context():
+            snapshot = lambda: (
+                sorted((r.period, r.dimension, str(r.period_start), r.key, r.bookings, r.persons, round(r.revenue, 2))
+                       for r in tms.BookingRollup.query if r.bookings),
+                sorted((s.user_id, s.booking_count, round(s.total_spent, 2), str(s.last_trip_date), s.last_trip_package)
+                       for s in tms.UserBookingSummary.query))
+            incremental = snapshot()
+            tms.rebuild_rollups()
+            for uid in user_ids:
+                tms.rebuild_booking_summary(uid)
+            tms.db.session.flush()
+            rebuilt = snapshot()
+            tms.db.session.rollback()
+            reserved_left = tms.db.session.query(tms.func.sum(tms.TourSlot.reserved)).filter_by(tour_id=tour.id).scalar()
+        sink.shutdown()
+
+    report = {
+        "benchmark": "cancel",
+        "tour_bookings": args.tour_bookings,
+        "travellers": args.travellers,
+        "one_at_a_time": {
+            "bookings": len(sample),
+            "ms_per_booking": round(single_seconds * 1000 / len(sample), 2),
+            "projected_seconds_for_tour": round(single_seconds / len(sample) * args.tour_bookings, 1),
+            "notices": len(sample),
+        },
+        "bulk": {
+            "bookings": cancellation["bookings"],
+            "expected_bookings": remaining,
+            "users": cancellation["users"],
+            "seconds": round(bulk_seconds, 2),
+            "ms_per_booking": round(bulk_seconds * 1000 / cancellation["bookings"], 3),
+        },
+        "notices": {
+            "send_rate": args.send_rate,
+            "drain_seconds": round(drain_seconds, 1),
+            "per_second": round(cancellation["users"] / drain_seconds, 1),
+            "smtp_connections": sink.connections - connections_before,
+            "progress": progress[::max(1, len(progress) // 10)] + progress[-1:],
+        },
+        "rollups_match_rebuild": incremental[0] == rebuilt[0],
+        "summaries_match_rebuild": incremental[1] == rebuilt[1],
+        "places_left_reserved": reserved_left,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not (report["rollups_match_rebuild"] and report["summaries_match_rebuild"]) or reserved_left:
+        sys.exit("bulk cancellation left summaries, rollups or slots inconsistent")
+    return report
+
+
+# Flood -> where the failed logins come from
+FLOOD_SOURCES = {
+    "none": None,
+    "one_ip": lambda rng: "203.0.113.7",
+    "many_ips": lambda rng: f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+}
+
+
+def login_flood(args):
+    """/api/tours latency while a script floods /api/login, with and without rate limiting and load shedding"""
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'flood.db')}"
+        tms, app, sink = bench_app(database_url, args.bcrypt_rounds)
+        ctx = seed_load_data(tms, app, args)
+        sink.shutdown()
+
+        def run(port, source):
+            stop = threading.Event()
+            browse_ms, logins = [], collections.Counter()
+
+            def browser(i):
+                client = BenchClient(port)
+                client.request("GET", args.path, route="warmup")
+                while not stop.is_set():
+                    began = time.perf_counter()
+                    status, _ = client.request("GET", args.path, route="tours")
+                    browse_ms.append((time.perf_counter() - began) * 1000)
+                    assert status == 200, status
+                    time.sleep(args.think)
+                client.close()
+
+            def flooder(i):
+                rng = random.Random(args.seed * 1000 + i)
+                client = BenchClient(port)
+                while not stop.is_set():
+                    # Failed logins still pay for a full bcrypt check
+                    status, _ = client.request(
+                        "POST", "/api/login", {"username": rng.choice(ctx["usernames"]), "password": "wrong"},
+                        route="login", headers={"X-Forwarded-For": FLOOD_SOURCES[source](rng)})
+                    logins[status] += 1
+                client.close()
+
+            member_ms, members = [], collections.Counter()
+
+            def member():
+                # Real users logging in once a second, each from their own address
+                client = BenchClient(port)
+                for i in itertools.count():
+                    if stop.is_set():
+                        break
+                    began = time.perf_counter()
+                    status, _ = client.request(
+                        "POST", "/api/login", {"username": ctx["usernames"][i], "password": BENCH_PASSWORD},
+                        route="member", headers={"X-Forwarded-For": f"198.51.100.{i % 250 + 1}"})
+                    member_ms.append((time.perf_counter() - began) * 1000)
+                    members[status] += 1
+                    stop.wait(1.0)
+                client.close()
+
+            threads = [threading.Thread(target=browser, args=(i,)) for i in range(args.browsers)]
+            threads.append(threading.Thread(target=member))
+            if FLOOD_SOURCES[source]:
+                threads += [threading.Thread(target=flooder, args=(i,)) for i in range(args.flooders)]
+            for thread in threads:
+                thread.start()
+            time.sleep(args.duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            return {"tours": latency_percentiles(browse_ms),
+                    "member_login": {**latency_percentiles(member_ms), "statuses": dict(members)},
+                    "flood_logins_per_second": {str(k): round(v / args.duration, 1) for k, v in sorted(logins.items())}}
+
+        results = {}
+        # before: no admission control and bcrypt at normal priority
+        variants = {"before": {"RATE_LIMIT_ENABLED": "0", "HASH_NICENESS": "0"}, "after": {}}
+        for variant, settings in variants.items():
+            env = {"PROXY_COUNT": "1", **settings}
+            for source in FLOOD_SOURCES:
+                # A fresh server per scenario, so no scenario starts with another's buckets
+                process, port = start_bench_server("sync", database_url, args.bcrypt_rounds, env)
+                try:
+                    result = run(port, source)
+                    results.setdefault(source, {})[variant] = result
+                    tours = result["tours"]
+                    print(f"{variant:6} flood {source:8} tours p50 {tours['p50_ms']:8.2f}  "
+                          f"p99 {tours['p99_ms']:8.2f} ms  member login p50 {result['member_login']['p50_ms']:8.1f} ms "
+                          f"{result['member_login']['statuses']}  flood/s {result['flood_logins_per_second']}",
+                          file=sys.stderr)
+                finally:
+                    process.terminate()
+                    process.wait()
+
+    report = {
+        "benchmark": "login-flood",
+        "cpus": os.cpu_count(),
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "browsers": args.browsers,
+        "flooders": args.flooders,
+        "duration_seconds": args.duration,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def recommend(args):
+    """Recommendation build time and memory, incremental refreshes, and endpoint latency"""
+    import tracemalloc
+    from sqlalchemy import insert
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        tms, app, sink = bench_app(f"sqlite:///{os.path.join(tmp, 'recommend.db')}", 4)
+        sink.shutdown()
+        with app.app_context():
+            tms.migrate_schema()
+            tours, _ = synthetic_tours(args.tours, seed=args.seed)
+            tms.db.session.execute(insert(tms.Tour), tours)
+            tms.db.session.execute(insert(tms.User), [
+                {"username": f"bench{i}", "email": f"bench{i}@example.com", "phone": f"8{i:09d}",
+                 "password": "-", "is_admin": False} for i in range(args.users)])
+            tms.db.session.commit()
+            tour_ids = [tid for (tid,) in tms.db.session.query(tms.Tour.id).order_by(tms.Tour.id)]
+            user_ids = [uid for (uid,) in tms.db.session.query(tms.User.id).order_by(tms.User.id)]
+
+        # Tours come in themes of args.theme_size; each user mostly books from one
+        # theme, so similar tours are the rest of the theme. A few trending tours
+        # get extra bookings in the last week.
+        themes = [tour_ids[i:i + args.theme_size] for i in range(0, len(tour_ids), args.theme_size)]
+        trending = rng.sample(tour_ids, 10)
+        now = time.time()
+
+        def add_bookings(count, max_age_days):
+            with app.app_context():
+                for start in range(0, count, 20000):
+                    rows = []
+                    for _ in range(start, min(start + 20000, count)):
+                        user = rng.choice(user_ids)
+                        if rng.random() < 0.05:
+                            tour, age = rng.choice(trending), rng.uniform(0, 7)
+                        elif rng.random() < 0.8:
+                            tour, age = rng.choice(themes[user % len(themes)]), rng.uniform(0, max_age_days)
+                        else:
+                            tour, age = rng.choice(tour_ids), rng.uniform(0, max_age_days)
+                        rows.append({"user_id": user, "tour_id": tour, "persons": 1, "price_per_person": 1.0,
+                                     "total_price": 1.0, "booking_date":
+                                     tms.datetime.datetime.utcfromtimestamp(now - age * 86400)})
+                    tms.db.session.execute(insert(tms.Booking), rows)
+                tms.db.session.commit()
+
+        started = time.perf_counter()
+        add_bookings(args.bookings, 365)
+        seed_seconds = time.perf_counter() - started
+
+        with app.app_context():
+            started = time.perf_counter()
+            recommender = tms.TourRecommender.build()
+            build_seconds = time.perf_counter() - started
+            tracemalloc.start()
+            tms.TourRecommender.build()
+            _, build_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        refreshes = []
+        for count in (int(c) for c in args.refresh.split(",")):
+            add_bookings(count, 0.01)
+            with app.app_context():
+                started = time.perf_counter()
+                folded = recommender.refresh()
+                refreshes.append({"bookings": folded, "ms": round((time.perf_counter() - started) * 1000, 1)})
+
+        with app.app_context():
+            started = time.perf_counter()
+            rebuilt = tms.TourRecommender.build()
+            rebuild_seconds = time.perf_counter() - started
+
+        def similar_table(r):
+            top, similarity, _ = r.ranked
+            return {tour_id: (top[c].tolist(), similarity[c].round(9).tolist()) for tour_id, c in r.tours.items()}
+
+        same_theme = []
+        top, _, _ = rebuilt.ranked
+        for tour_id, column in rebuilt.tours.items():
+            theme = set(themes[tour_ids.index(tour_id) // args.theme_size])
+            neighbours = [t for t in top[column].tolist() if t >= 0]
+            same_theme.append(sum(t in theme for t in neighbours) / max(len(neighbours), 1))
+
+        tms.recommender = recommender
+        client = app.test_client()
+
+        def timed(paths):
+            samples = []
+            for path in paths:
+                started = time.perf_counter()
+                response = client.get(path)
+                response.get_data()
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, (path, response.status_code)
+                response.close()
+            return latency_percentiles(samples)
+
+        probes = [rng.choice(tour_ids) for _ in range(args.queries)]
+        similar_latency = timed(f"/api/tours/{t}/similar" for t in probes)
+        popular_latency = timed("/api/tours/popular" for _ in probes)
+        popular = recommender.popular()[:10]
+
+    report = {
+        "benchmark": "recommend",
+        "bookings": args.bookings,
+        "users": args.users,
+        "tours": args.tours,
+        "seed_seconds": round(seed_seconds, 1),
+        "build": {
+            "seconds": round(build_seconds, 2),
+            "co_booked_pairs": int(recommender.co_booked.nnz),
+            "table_bytes": recommender.nbytes(),
+            "peak_traced_bytes": build_peak,
+        },
+        "refresh": refreshes,
+        "rebuild_seconds": round(rebuild_seconds, 2),
+        "incremental_matches_rebuild": {
+            "similar": similar_table(recommender) == similar_table(rebuilt),
+            "popular": recommender.popular()[:tms.POPULAR_MAX_RESULTS] == rebuilt.popular()[:tms.POPULAR_MAX_RESULTS],
+        },
+        "similar_in_same_theme": round(statistics.mean(same_theme), 3),
+        "trending_in_popular_top10": len(set(trending) & set(popular)),
+        "similar_endpoint": similar_latency,
+        "popular_endpoint": popular_latency,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not all(report["incremental_matches_rebuild"].values()):
+        sys.exit("incremental refreshes diverged from a full rebuild")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cold = commands.add_parser("coldstart", help=coldstart.__doc__)
+    cold.add_argument("--runs", type=int, default=10)
+    cold.add_argument("--path", default="/api/status")
+    cold.set_defaults(func=coldstart)
+
+    search_parser = commands.add_parser("search", help=search.__doc__)
+    search_parser.add_argument("--tours", type=int, default=100000)
+    search_parser.add_argument("--queries", type=int, default=2000)
+    search_parser.set_defaults(func=search)
+
+    load_parser = commands.add_parser("load", help=load.__doc__)
+    load_parser.add_argument("--database-url", help="empty, disposable database (default: temporary SQLite file)")
+    load_parser.add_argument("--users", type=int, default=200)
+    load_parser.add_argument("--tours", type=int, default=500)
+    load_parser.add_argument("--bookings", type=int, default=20000)
+    load_parser.add_argument("--seed", type=int, default=42)
+    load_parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    load_parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts")
+    load_parser.add_argument("--requests", type=int, default=500, help="requests per scenario and concurrency level")
+    load_parser.add_argument("--scenarios", help=f"comma-separated subset of {', '.join(LOAD_SCENARIOS)}")
+    load_parser.add_argument("--output", help="also write the JSON report here")
+    load_parser.add_argument("--compare", help="baseline report; exit 1 if this run regresses against it")
+    load_parser.add_argument("--tolerance", type=float, default=0.25,
+                             help="allowed relative change in p95 and throughput (default 0.25)")
+    load_parser.set_defaults(func=load)
+
+    capacity_parser = commands.add_parser("capacity", help=capacity.__doc__)
+    capacity_parser.add_argument("--database-url", help="empty, disposable database (default: temporary SQLite file)")
+    capacity_parser.add_argument("--bookers", type=int, default=300)
+    capacity_parser.add_argument("--attempts", type=int, default=3, help="bookings each booker tries")
+    capacity_parser.add_argument("--capacity", type=int, default=500, help="places on the hot date")
+    capacity_parser.add_argument("--max-persons", type=int, default=4)
+    capacity_parser.add_argument("--seed", type=int, default=42)
+    capacity_parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    capacity_parser.set_defaults(func=capacity)
+
+    serving_parser = commands.add_parser("serving", help=serving.__doc__)
+    serving_parser.add_argument("--database-url", help="empty, disposable database (default: temporary SQLite file)")
+    serving_parser.add_argument("--users", type=int, default=200)
+    serving_parser.add_argument("--tours", type=int, default=500)
+    serving_parser.add_argument("--bookings", type=int, default=20000)
+    serving_parser.add_argument("--seed", type=int, default=42)
+    serving_parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    serving_parser.add_argument("--connections", default="16,128,512", help="comma-separated open connection counts")
+    serving_parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario and level")
+    serving_parser.add_argument("--scenarios", help=f"comma-separated subset of {', '.join(SERVING_SCENARIOS)}")
+    serving_parser.add_argument("--output", help="also write the JSON report here")
+    serving_parser.set_defaults(func=serving)
+
+    payload_parser = commands.add_parser("payload", help=payload.__doc__)
+    payload_parser.add_argument("--tours", type=int, default=2000)
+    payload_parser.add_argument("--requests", type=int, default=200, help="timed requests per route and variant")
+    payload_parser.add_argument("--seed", type=int, default=42)
+    payload_parser.add_argument("--output", help="also write the JSON report here")
+    payload_parser.set_defaults(func=payload)
+
+    normalize_parser = commands.add_parser("normalize", help=normalize.__doc__)
+    normalize_parser.add_argument("--users", type=int, default=200)
+    normalize_parser.add_argument("--tours", type=int, default=500)
+    normalize_parser.add_argument("--bookings", type=int, default=200000)
+    normalize_parser.add_argument("--seed", type=int, default=42)
+    normalize_parser.add_argument("--batch-size", type=int, default=1000, help="bookings per backfill transaction")
+    normalize_parser.add_argument("--queries", type=int, default=100, help="timed requests per query kind")
+    normalize_parser.add_argument("--output", help="also write the JSON report here")
+    normalize_parser.set_defaults(func=normalize)
+
+    archive_parser = commands.add_parser("archive", help=archive.__doc__)
+    archive_parser.add_argument("--users", type=int, default=5000)
+    archive_parser.add_argument("--tours", type=int, default=500)
+    archive_parser.add_argument("--bookings", type=int, default=200000)
+    archive_parser.add_argument("--seed", type=int, default=42)
+    archive_parser.add_argument("--days", type=int, default=90, help="archive bookings older than this")
+    archive_parser.add_argument("--queries", type=int, default=50, help="timed requests per query kind")
+    archive_parser.add_argument("--output", help="also write the JSON report here")
+    archive_parser.set_defaults(func=archive)
+
+    cancel_parser = commands.add_parser("cancel", help=cancel.__doc__)
+    cancel_parser.add_argument("--travellers", type=int, default=20000, help="users with a booking on the cancelled tour")
+    cancel_parser.add_argument("--tour-bookings", type=int, default=30000)
+    cancel_parser.add_argument("--tours", type=int, default=500)
+    cancel_parser.add_argument("--bookings", type=int, default=100000, help="bookings on other tours")
+    cancel_parser.add_argument("--seed", type=int, default=42)
+    cancel_parser.add_argument("--single", type=int, default=500, help="bookings first cancelled one request at a time")
+    cancel_parser.add_argument("--send-rate", type=int, default=200, help="EMAIL_SEND_RATE while draining notices")
+    cancel_parser.add_argument("--poll", type=float, default=1.0, help="seconds between progress requests")
+    cancel_parser.add_argument("--output", help="also write the JSON report here")
+    cancel_parser.set_defaults(func=cancel)
+
+    flood_parser = commands.add_parser("login-flood", help=login_flood.__doc__)
+    flood_parser.add_argument("--users", type=int, default=200)
+    flood_parser.add_argument("--tours", type=int, default=100)
+    flood_parser.add_argument("--bookings", type=int, default=1000)
+    flood_parser.add_argument("--seed", type=int, default=42)
+    flood_parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    flood_parser.add_argument("--path", default="/api/tours", help="the browsing request that is timed")
+    flood_parser.add_argument("--browsers", type=int, default=2)
+    flood_parser.add_argument("--think", type=float, default=0.05, help="seconds each browser waits between requests")
+    flood_parser.add_argument("--flooders", type=int, default=16, help="connections sending failed logins")
+    flood_parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    flood_parser.add_argument("--output", help="also write the JSON report here")
+    flood_parser.set_defaults(func=login_flood)
+
+    recommend_parser = commands.add_parser("recommend", help=recommend.__doc__)
+    recommend_parser.add_argument("--users", type=int, default=100000)
+    recommend_parser.add_argument("--tours", type=int, default=2000)
+    recommend_parser.add_argument("--bookings", type=int, default=1000000)
+    recommend_parser.add_argument("--theme-size", type=int, default=20, help="tours per theme users book from")
+    recommend_parser.add_argument("--seed", type=int, default=42)
+    recommend_parser.add_argument("--refresh", default="100,1000,10000", help="comma-separated new-booking batches")
+    recommend_parser.add_argument("--queries", type=int, default=200, help="timed requests per endpoint")
+    recommend_parser.add_argument("--output", help="also write the JSON report here")
+    recommend_parser.set_defaults(func=recommend)
+
+    server_parser = commands.add_parser("server", help=bench_server.__doc__)
+    server_parser.add_argument("--mode", choices=("sync", "async"), required=True)
+    server_parser.add_argument("--database-url", required=True)
+    server_parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    server_parser.set_defaults(func=bench_server)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import zlib
+
+import pytest
+
+# app.py builds its Flask app at import time from DATABASE_URL, so point it at
+# a throwaway SQLite file before any test imports it.
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='tms-tests-'), 'tms.db'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as tms  # noqa: E402
+
+PASSWORD = 'secret123'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """A fresh app on its own SQLite file, with the default admin and tours.
+
+    app.py keeps its caches, stores and limiters per process, so each test
+    gets new ones. The email workers and the sweeper are never started.
+    """
+    monkeypatch.setattr(tms, 'BCRYPT_LOG_ROUNDS', 4)
+    monkeypatch.setattr(tms, 'EMAIL_SEND_RATE', 0)
+    monkeypatch.setattr(tms, 'ARCHIVE_FOLDER', str(tmp_path / 'archive'))
+    monkeypatch.setattr(tms, 'cache_versions', {})
+    monkeypatch.setattr(tms, 'catalog_snapshot', None)
+    monkeypatch.setattr(tms, 'search_index', None)
+    monkeypatch.setattr(tms, 'recommender', None)
+    monkeypatch.setattr(tms, 'identity_cache', tms.IdentityCache())
+    monkeypatch.setattr(tms, 'otp_store', tms.MemoryOTPStore())
+    monkeypatch.setattr(tms, 'rate_limiter', tms.MemoryRateLimiter())
+    monkeypatch.setattr(tms, 'booking_archive', tms.BookingArchive())
+    monkeypatch.setattr(tms, 'wake_email_workers', lambda: None)
+    monkeypatch.setattr(tms, 'start_sweeper', lambda: None)
+
+    url = f"sqlite:///{tmp_path / 'tms.db'}"
+    app = tms.create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': url,
+        # Concurrent writers queue on SQLite's file lock instead of failing after 5s
+        'SQLALCHEMY_ENGINE_OPTIONS': {**tms.engine_options(url), 'connect_args': {'timeout': 30}},
+    })
+    with app.app_context():
+        tms.migrate_schema()
+        tms.seed_admin()
+        tms.seed_tours()
+    yield app
+    with app.app_context():
+        tms.db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """An anonymous test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def add_user(app):
+    """Create a user with PASSWORD; returns its id"""
+    def add(username, is_admin=False):
+        with app.app_context():
+            user = tms.User(username=username, email=f'{username}@example.com',
+                            phone=f'{zlib.crc32(username.encode()) % 10 ** 10:010d}',
+                            password=tms.password_hasher.hash(PASSWORD), is_admin=is_admin)
+            tms.db.session.add(user)
+            tms.db.session.commit()
+            return user.id
+    return add
+
+
+@pytest.fixture
+def login(app):
+    """A new test client logged in as `username`"""
+    def log_in(username, password=PASSWORD):
+        client = app.test_client()
+        response = client.post('/api/login', json={'username': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+        return client
+    return log_in
+
+
+@pytest.fixture
+def user_client(add_user, login):
+    add_user('traveller')
+    return login('traveller')
+
+
+@pytest.fixture
+def admin_client(login):
+    return login('admin', 'admin123')
+
+
+@pytest.fixture
+def tours(app):
+    """Seeded tours by name"""
+    with app.app_context():
+        return {tour.name: tour.id for tour in tms.Tour.query}
+
+
+@pytest.fixture
+def add_booking(app):
+    """Insert a booking straight into the table, skipping summaries and rollups; returns its id"""
+    def add(user_id, tour_id, booking_date, persons=1, price_per_person=100.0, **fields):
+        with app.app_context():
+            booking = tms.Booking(user_id=user_id, tour_id=tour_id, booking_date=booking_date, persons=persons,
+                                  price_per_person=price_per_person, total_price=price_per_person * persons,
+                                  **fields)
+            tms.db.session.add(booking)
+            tms.db.session.commit()
+            return booking.id
+    return add
+
+
+def booking_payload(tour_id, **fields):
+    """A confirm_booking body as the booking page sends it"""
+    payload = {'email': 'traveller@example.com', 'mobile': '9000000000', 'tour_id': tour_id,
+               'persons': 1, 'price_per_person': 100.0, 'total_price': 100.0, 'payment_mode': 'UPI'}
+    payload.update(fields)
+    return payload
@@ -0,0 +1,98 @@
+"""Keyset pages, filters and the streamed ndjson/csv export of /api/admin/bookings"""
+import csv
+import datetime
+import io
+import json
+
+import pytest
+
+import app as tms
+
+START = datetime.datetime(2025, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def bookings(add_user, add_booking, tours):
+    """Eleven bookings by two users over five days; some share a timestamp, so id breaks the tie.
+
+    Returns (id, username, tour name, booking_date) newest first.
+    """
+    users = {'asha': add_user('asha'), 'ravi': add_user('ravi')}
+    made = []
+    for i in range(11):
+        username = 'asha' if i % 3 else 'ravi'
+        tour = 'Tajmahal' if i % 2 else 'Red Fort'
+        booked = START + datetime.timedelta(days=i // 3)
+        made.append((add_booking(users[username], tours[tour], booked), username, tour, booked))
+    return sorted(made, key=lambda b: (b[3], b[0]), reverse=True)
+
+
+def pages(client, query, limit):
+    ids, cursor = [], None
+    while True:
+        url = f'/api/admin/bookings?limit={limit}&{query}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        assert len(page['bookings']) <= limit
+        ids += [b['id'] for b in page['bookings']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def test_plain_list_is_newest_first_with_usernames(admin_client, bookings):
+    rows = admin_client.get('/api/admin/bookings').get_json()
+    assert [(b['id'], b['username'], b['package_name']) for b in rows] == [b[:3] for b in bookings]
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 500])
+def test_keyset_pages_cover_every_booking_once(admin_client, bookings, limit):
+    assert pages(admin_client, '', limit) == [b[0] for b in bookings]
+
+
+def test_filters_apply_to_pages(admin_client, bookings, tours):
+    expected = [b[0] for b in bookings if b[1] == 'ravi' and b[2] == 'Tajmahal']
+    assert pages(admin_client, f"user=ravi&tour_id={tours['Tajmahal']}", 1) == expected
+
+    day = START + datetime.timedelta(days=1)
+    expected = [b[0] for b in bookings if b[3].date() == day.date()]
+    query = f"date_from={day:%Y-%m-%d}&date_to={day:%Y-%m-%d}"
+    assert pages(admin_client, query, 2) == expected
+
+
+@pytest.mark.parametrize('query', ['tour_id=abc', 'date_from=03/01/2025', 'limit=2&cursor=bm90LWpzb24='])
+def test_bad_filter_or_cursor_is_a_400(admin_client, bookings, query):
+    response = admin_client.get(f'/api/admin/bookings?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['message'].startswith('Invalid filter')
+
+
+def test_ndjson_export_streams_every_booking(admin_client, bookings, monkeypatch):
+    monkeypatch.setattr(tms, 'BOOKINGS_EXPORT_CHUNK_SIZE', 4)
+    response = admin_client.get('/api/admin/bookings?format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=bookings.ndjson'
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(r['id'], r['username']) for r in rows] == [b[:2] for b in bookings]
+    assert set(rows[0]) == set(tms.ADMIN_BOOKING_FIELDS)
+
+
+def test_csv_export_has_a_header_and_honours_filters(admin_client, bookings, tours):
+    response = admin_client.get(f"/api/admin/bookings?format=csv&tour_id={tours['Red Fort']}")
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == tms.ADMIN_BOOKING_FIELDS
+    assert [int(r[0]) for r in rows[1:]] == [b[0] for b in bookings if b[2] == 'Red Fort']
+    assert {r[rows[0].index('package_name')] for r in rows[1:]} == {'Red Fort'}
+
+
+def test_unknown_export_format_is_a_400(admin_client, bookings):
+    assert admin_client.get('/api/admin/bookings?format=xml').status_code == 400
+
+
+def test_only_admins_see_every_booking(user_client, bookings):
+    assert user_client.get('/api/admin/bookings').status_code == 403
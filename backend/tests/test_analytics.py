@@ -0,0 +1,84 @@
+"""Booking rollups behind /api/admin/analytics follow their tours through edits and imports"""
+import io
+import json
+
+import pytest
+
+from conftest import booking_payload
+
+
+@pytest.fixture
+def booked(user_client, tours):
+    """Three Tajmahal bookings and one Red Fort booking, all today"""
+    for tour, persons in (('Tajmahal', 1), ('Tajmahal', 2), ('Tajmahal', 3), ('Red Fort', 1)):
+        response = user_client.post('/api/confirm_booking', json=booking_payload(
+            tours[tour], persons=persons, total_price=100.0 * persons))
+        assert response.status_code == 200
+
+
+def totals(admin_client, dimension, period='month'):
+    response = admin_client.get(f'/api/admin/analytics?dimension={dimension}&period={period}')
+    assert response.status_code == 200
+    return {t['key']: (t['bookings'], t['persons'], t['revenue']) for t in response.get_json()['totals']}
+
+
+def tour_row(**changes):
+    row = {'name': 'Tajmahal', 'location': 'Agra', 'country': 'India', 'price': 250.0,
+           'description': 'Dedicated to his wife Mumtaz by Shajahan.', 'image_path': '/tajmahal.webp'}
+    row.update(changes)
+    return row
+
+
+def test_bookings_are_rolled_up(admin_client, booked):
+    assert totals(admin_client, 'package') == {'Tajmahal': (3, 6, 600.0), 'Red Fort': (1, 1, 100.0)}
+    assert totals(admin_client, 'country', 'day') == {'India': (4, 7, 700.0)}
+
+
+def test_admin_edit_moves_the_rollups(admin_client, booked, tours):
+    response = admin_client.put(f"/api/admin/tours/{tours['Tajmahal']}",
+                                json={'name': 'Taj Mahal', 'country': 'Bharat'})
+    assert response.status_code == 200
+    assert totals(admin_client, 'package') == {'Taj Mahal': (3, 6, 600.0), 'Red Fort': (1, 1, 100.0)}
+    assert totals(admin_client, 'country') == {'Bharat': (3, 6, 600.0), 'India': (1, 1, 100.0)}
+
+
+def test_imported_country_change_moves_the_rollups(admin_client, booked):
+    upload = '\n'.join(json.dumps(row) for row in (
+        tour_row(country='Bharat'),
+        tour_row(name='Hampi', location='Karnataka', country='Bharat', image_path='/hampi.webp'),
+    ))
+    response = admin_client.post('/api/admin/tours/import?format=jsonl',
+                                 data={'file': (io.BytesIO(upload.encode()), 'tours.jsonl')})
+    assert response.status_code == 200
+    assert (response.get_json()['inserted'], response.get_json()['updated']) == (1, 1)
+
+    for period in ('day', 'month'):
+        assert totals(admin_client, 'country', period) == {'Bharat': (3, 6, 600.0), 'India': (1, 1, 100.0)}
+    assert totals(admin_client, 'package') == {'Tajmahal': (3, 6, 600.0), 'Red Fort': (1, 1, 100.0)}
+    assert totals(admin_client, 'all') == {'all': (4, 7, 700.0)}
+
+
+def test_import_cli_moves_the_rollups(app, admin_client, booked, tmp_path):
+    path = tmp_path / 'tours.csv'
+    path.write_text('name,location,country,description,price,image_path\n'
+                    'Tajmahal,Agra,Bharat,Marble mausoleum,250,/tajmahal.webp\n'
+                    'Red Fort,Delhi,India,Dedicated to our independence.,1200,/red-fort.webp\n')
+    result = app.test_cli_runner().invoke(args=['import-tours', str(path)])
+    assert result.exit_code == 0, result.output
+    assert '0 inserted, 2 updated' in result.output
+    assert totals(admin_client, 'country') == {'Bharat': (3, 6, 600.0), 'India': (1, 1, 100.0)}
+
+    # Importing the same file again changes nothing
+    app.test_cli_runner().invoke(args=['import-tours', str(path)])
+    assert totals(admin_client, 'country') == {'Bharat': (3, 6, 600.0), 'India': (1, 1, 100.0)}
+
+
+def test_bad_rows_do_not_stop_the_move(admin_client, booked):
+    upload = '\n'.join(json.dumps(row) for row in (
+        tour_row(country='Bharat'),
+        tour_row(name='Hampi', location='K' * 101, country='Bharat'),
+    ))
+    response = admin_client.post('/api/admin/tours/import?format=jsonl',
+                                 data={'file': (io.BytesIO(upload.encode()), 'tours.jsonl')})
+    assert response.get_json()['failed'] == 1
+    assert totals(admin_client, 'country') == {'Bharat': (3, 6, 600.0), 'India': (1, 1, 100.0)}
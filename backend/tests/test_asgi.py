@@ -0,0 +1,206 @@
+"""The async server answers its five routes exactly as the Flask routes do"""
+import asyncio
+import datetime
+import json
+import time
+import urllib.parse
+
+import pytest
+from werkzeug.datastructures import Headers
+
+import app as tms
+from conftest import booking_payload
+
+pytest.importorskip('asgiref')
+pytest.importorskip('aiosqlite')
+pytest.importorskip('greenlet')
+import asgi  # noqa: E402
+
+TRAVEL_DATE = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status_code = status
+        self.headers = headers
+        self.data = body
+
+
+class Server:
+    """Calls an AsyncTMS in-process, on one event loop so its pooled connections stay usable"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.asgi = asgi.AsyncTMS(flask_app)
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.run_until_complete(self.asgi.engine.dispose())
+        self.loop.close()
+
+    def request(self, method, url, body=b'', headers=()):
+        path, _, query = url.partition('?')
+        scope = {'type': 'http', 'http_version': '1.1', 'scheme': 'http', 'method': method, 'path': path,
+                 'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+                 'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+                 'server': ('localhost', 80), 'client': ('127.0.0.1', 40000)}
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop() if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        self.loop.run_until_complete(self.asgi(scope, receive, send))
+        headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in sent[0]['headers']])
+        return Response(sent[0]['status'], headers, b''.join(m.get('body', b'') for m in sent[1:]))
+
+    def get(self, url, client=None, headers=()):
+        return self.request('GET', url, headers=[*self.cookie(client), *headers])
+
+    def post(self, url, client=None, json=None):
+        body = self.flask_app.json.dumps(json).encode()
+        return self.request('POST', url, body, [('Content-Type', 'application/json'), *self.cookie(client)])
+
+    def cookie(self, client):
+        """The session cookie of a logged-in Flask test client"""
+        if client is None:
+            return []
+        cookie = client.get_cookie(self.flask_app.config['SESSION_COOKIE_NAME'])
+        return [('Cookie', f'{cookie.key}={cookie.value}')]
+
+    def session(self, response):
+        """The Flask session in a response's Set-Cookie, or None"""
+        name = self.flask_app.config['SESSION_COOKIE_NAME']
+        for header in response.headers.getlist('Set-Cookie'):
+            key, _, value = header.split(';')[0].partition('=')
+            if key == name:
+                return self.flask_app.session_interface.get_signing_serializer(self.flask_app).loads(value)
+        return None
+
+
+@pytest.fixture
+def server(app):
+    server = Server(app)
+    yield server
+    server.close()
+
+
+def assert_same(flask_response, async_response):
+    assert async_response.status_code == flask_response.status_code
+    assert async_response.data == flask_response.data
+    assert async_response.headers.get('ETag') == flask_response.headers.get('ETag')
+
+
+@pytest.mark.parametrize('url', [
+    '/api/tours',
+    '/api/tours?fields=id,name,price',
+    '/api/tours?fields=secret',
+    '/api/packages/filter?locations=Agra,Delhi&sort=price_desc',
+    '/api/packages/filter?sort=name&limit=2',
+    '/api/packages/filter?sort=rating',
+    '/api/packages/filter?cursor=not-a-cursor&limit=2',
+    '/api/packages/facets',
+    '/api/packages/facets?countries=India&min_price=300',
+])
+def test_catalog_routes_match(client, server, url):
+    flask_response = client.get(url)
+    async_response = server.get(url)
+    assert_same(flask_response, async_response)
+    etag = flask_response.headers.get('ETag')
+    if etag:
+        assert_same(client.get(url, headers={'If-None-Match': etag}),
+                    server.get(url, headers=[('If-None-Match', etag)]))
+
+
+def test_flask_tour_write_is_seen_by_the_async_catalog_at_once(client, admin_client, server, tours, monkeypatch):
+    monkeypatch.setattr(tms, 'CACHE_VERSION_CHECK_INTERVAL', 3600)
+    etag = server.get('/api/tours').headers['ETag']
+    assert admin_client.put(f"/api/admin/tours/{tours['Tajmahal']}", json={'price': 333.0}).status_code == 200
+
+    fresh = server.get('/api/tours', headers=[('If-None-Match', etag)])
+    assert fresh.status_code == 200
+    assert {t['name']: t['price'] for t in json.loads(fresh.data)}['Tajmahal'] == 333.0
+    assert_same(client.get('/api/tours'), server.get('/api/tours'))
+
+
+@pytest.fixture
+def history(app, user_client, tours, add_booking):
+    with app.app_context():
+        user_id = tms.User.query.filter_by(username='traveller').one().id
+    start = datetime.datetime(2025, 3, 1, 12, 0)
+    for i in range(5):
+        add_booking(user_id, tours['Tajmahal' if i % 2 else 'Red Fort'], start + datetime.timedelta(days=i // 2))
+
+
+def test_my_history_matches(user_client, server, history):
+    urls = ['/api/bookings/my_history', '/api/bookings/my_history?limit=2',
+            '/api/bookings/my_history?date_from=2025-03-02', '/api/bookings/my_history?date_from=yesterday']
+    for url in urls:
+        assert_same(user_client.get(url), server.get(url, user_client))
+
+    cursor = user_client.get('/api/bookings/my_history?limit=2').get_json()['next_cursor']
+    url = f'/api/bookings/my_history?limit=2&cursor={urllib.parse.quote(cursor)}'
+    assert_same(user_client.get(url), server.get(url, user_client))
+
+
+def test_my_history_without_a_login_goes_to_flask(client, server):
+    assert_same(client.get('/api/bookings/my_history'), server.get('/api/bookings/my_history'))
+
+
+@pytest.mark.parametrize('fields', [
+    {'persons': 'abc'},
+    {'persons': 0, 'travel_date': TRAVEL_DATE},
+    {'total_price': '-1'},
+    {'package_name': 'Atlantis', 'tour_id': None},
+    {'travel_date': '2020-01-01'},
+    {'email': ''},
+])
+def test_rejected_bookings_match(user_client, server, tours, fields):
+    payload = {**booking_payload(tours['Tajmahal']), **fields}
+    assert_same(user_client.post('/api/confirm_booking', json=payload),
+                server.post('/api/confirm_booking', user_client, payload))
+
+
+def test_sold_out_booking_matches(user_client, admin_client, server, tours):
+    response = admin_client.put(f"/api/admin/tours/{tours['Tajmahal']}/slots",
+                                json={'date_from': TRAVEL_DATE, 'capacity': 1})
+    assert response.status_code == 200
+    payload = booking_payload(tours['Tajmahal'], persons=2, total_price=200.0, travel_date=TRAVEL_DATE)
+    flask_response = user_client.post('/api/confirm_booking', json=payload)
+    assert flask_response.status_code == 409
+    assert_same(flask_response, server.post('/api/confirm_booking', user_client, payload))
+
+
+def test_booking_matches_and_sticks_to_the_primary(app, login, add_user, server, tours):
+    add_user('traveller')
+    flask_client, async_client = login('traveller'), login('traveller')
+    payload = booking_payload(tours['Tajmahal'], persons='2', total_price=200.0)
+    before = time.time()
+    flask_response = flask_client.post('/api/confirm_booking', json=payload)
+    async_response = server.post('/api/confirm_booking', async_client, payload)
+
+    assert flask_response.status_code == async_response.status_code == 200
+    flask_body, async_body = flask_response.get_json(), json.loads(async_response.data)
+    assert async_body['id'] == flask_body['id'] + 1
+    assert {**async_body, 'id': None} == {**flask_body, 'id': None}
+
+    flask_session, async_session = server.session(flask_response), server.session(async_response)
+    assert async_session.keys() == flask_session.keys()
+    assert async_session['_user_id'] == flask_session['_user_id']
+    assert async_session['primary_until'] >= before + tms.READ_YOUR_WRITES_SECONDS
+    assert async_response.headers['Vary'] == 'Cookie'
+
+
+def test_rejected_booking_does_not_touch_the_session(user_client, server, tours):
+    response = server.post('/api/confirm_booking', user_client, booking_payload(tours['Tajmahal'], persons=0))
+    assert response.status_code == 400
+    assert server.session(response) is None
+
+
+def test_booking_without_a_login_goes_to_flask(client, server, tours):
+    payload = booking_payload(tours['Tajmahal'])
+    response = server.post('/api/confirm_booking', json=payload)
+    assert_same(client.post('/api/confirm_booking', json=payload), response)
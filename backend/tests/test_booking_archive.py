@@ -0,0 +1,126 @@
+"""Archived bookings read back from segment files and merged into every booking list"""
+import datetime
+import os
+
+import pytest
+
+import app as tms
+
+OLD = datetime.datetime(2023, 1, 1, 9, 30)
+RECENT = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+HISTORY_URLS = ['/api/bookings/my_history', '/api/bookings/my_history?date_from=2023-01-03',
+                '/api/bookings/my_history?date_from=2023-01-02&date_to=2023-01-04']
+ADMIN_URLS = ['/api/admin/bookings', '/api/admin/bookings?user=asha', '/api/admin/bookings?date_to=2023-01-03',
+              '/api/admin/bookings?package=Red+Fort', '/api/admin/bookings?country=India&user=traveller']
+
+
+def get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def walk(client, url, limit):
+    rows, cursor = [], None
+    while True:
+        separator = '&' if '?' in url else '?'
+        page = get(client, f'{url}{separator}limit={limit}' + (f'&cursor={cursor}' if cursor else ''))
+        rows += page['bookings']
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows
+
+
+@pytest.fixture
+def bookings(app, user_client, add_user, add_booking, tours):
+    """Seventeen old bookings by two users, some sharing a timestamp, and three recent ones"""
+    with app.app_context():
+        traveller = tms.User.query.filter_by(username='traveller').one().id
+    asha = add_user('asha')
+    for i in range(17):
+        add_booking(asha if i % 3 == 0 else traveller, tours['Red Fort' if i % 2 else 'Tajmahal'],
+                    OLD + datetime.timedelta(days=i // 4), persons=1 + i % 3)
+    for i in range(3):
+        add_booking(traveller, tours['Tajmahal'], RECENT + datetime.timedelta(minutes=i))
+
+
+def archive(app, monkeypatch, segment_rows=4):
+    monkeypatch.setattr(tms, 'ARCHIVE_BLOCK_ROWS', 2)
+    with app.app_context():
+        return tms.archive_bookings(segment_rows=segment_rows)
+
+
+def test_only_old_bookings_are_archived(app, bookings, monkeypatch):
+    assert archive(app, monkeypatch) == 17
+    with app.app_context():
+        assert tms.Booking.query.count() == 3
+        segments = tms.BookingArchiveSegment.query.all()
+    assert sorted(s.bookings for s in segments) == [1, 4, 4, 4, 4]
+    assert sorted(os.listdir(tms.ARCHIVE_FOLDER)) == sorted(s.file_name for s in segments)
+    assert archive(app, monkeypatch) == 0
+
+
+def test_my_history_is_unchanged_by_archiving(app, user_client, bookings, monkeypatch):
+    before = {url: get(user_client, url) for url in HISTORY_URLS}
+    pages = {limit: walk(user_client, '/api/bookings/my_history', limit) for limit in (1, 2, 5)}
+    archive(app, monkeypatch)
+
+    for url in HISTORY_URLS:
+        assert get(user_client, url) == before[url]
+    for limit, rows in pages.items():
+        assert walk(user_client, '/api/bookings/my_history', limit) == rows == before[HISTORY_URLS[0]]
+    assert len(before[HISTORY_URLS[0]]) == 14
+
+
+def test_admin_list_and_export_are_unchanged_by_archiving(app, admin_client, bookings, monkeypatch):
+    before = {url: get(admin_client, url) for url in ADMIN_URLS}
+    export = admin_client.get('/api/admin/bookings?format=ndjson').get_data(as_text=True)
+    archive(app, monkeypatch)
+
+    for url in ADMIN_URLS:
+        assert get(admin_client, url) == before[url]
+        for limit in (1, 3):
+            assert walk(admin_client, url, limit) == before[url]
+    assert admin_client.get('/api/admin/bookings?format=ndjson').get_data(as_text=True) == export
+
+
+def test_summary_and_rollups_count_archived_bookings(app, user_client, admin_client, bookings, monkeypatch):
+    with app.app_context():
+        tms.rebuild_rollups()
+    summary = get(user_client, '/api/bookings/summary')
+    analytics = get(admin_client, '/api/admin/analytics?dimension=package')
+    archive(app, monkeypatch)
+
+    with app.app_context():
+        tms.UserBookingSummary.query.delete()
+        tms.db.session.commit()
+        tms.rebuild_rollups()
+    assert get(user_client, '/api/bookings/summary') == summary
+    assert get(admin_client, '/api/admin/analytics?dimension=package') == analytics
+
+
+def test_archived_bookings_keep_their_tour_details(app, user_client, admin_client, bookings, tours, monkeypatch):
+    archive(app, monkeypatch)
+    assert admin_client.put(f"/api/admin/tours/{tours['Tajmahal']}", json={'name': 'Taj Mahal'}).status_code == 200
+    names = [(b['booking_date'][:4], b['package_name']) for b in get(user_client, '/api/bookings/my_history')]
+    assert {name for year, name in names if year == '2023'} == {'Tajmahal', 'Red Fort'}
+    assert {name for year, name in names if year != '2023'} == {'Taj Mahal'}
+
+
+def test_archived_bookings_cannot_be_cancelled(app, user_client, bookings, monkeypatch):
+    oldest = get(user_client, '/api/bookings/my_history')[-1]
+    archive(app, monkeypatch)
+    assert user_client.delete(f"/api/bookings/{oldest['id']}").status_code == 404
+
+
+def test_unreadable_segment_is_left_out(app, user_client, bookings, monkeypatch, capsys):
+    before = get(user_client, '/api/bookings/my_history')
+    archive(app, monkeypatch, segment_rows=100)
+    [name] = os.listdir(tms.ARCHIVE_FOLDER)
+    with open(os.path.join(tms.ARCHIVE_FOLDER, name), 'wb') as f:
+        f.write(b'\0' * 64)
+    monkeypatch.setattr(tms, 'booking_archive', tms.BookingArchive())
+
+    recent = [b for b in before if not b['booking_date'].startswith('2023')]
+    assert get(user_client, '/api/bookings/my_history') == recent
+    assert 'unreadable' in capsys.readouterr().out
@@ -0,0 +1,121 @@
+"""The per-user booking summary row and the paged /api/bookings/my_history"""
+import datetime
+
+import pytest
+
+import app as tms
+from conftest import booking_payload
+
+START = datetime.datetime(2025, 3, 1, 12, 0)
+
+
+def summary(app, user_id):
+    with app.app_context():
+        row = tms.db.session.get(tms.UserBookingSummary, user_id)
+        return row and (row.booking_count, row.total_spent, row.last_trip_package)
+
+
+def traveller_id(app):
+    with app.app_context():
+        return tms.User.query.filter_by(username='traveller').one().id
+
+
+def book(client, tour_id, persons=1, price=100.0):
+    response = client.post('/api/confirm_booking', json=booking_payload(
+        tour_id, persons=persons, price_per_person=price, total_price=price * persons))
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['id']
+
+
+def test_first_booking_creates_the_summary_and_later_ones_add_to_it(app, user_client, tours):
+    user_id = traveller_id(app)
+    assert summary(app, user_id) is None
+    book(user_client, tours['Tajmahal'], persons=2, price=250.0)
+    assert summary(app, user_id) == (1, 500.0, 'Tajmahal')
+    book(user_client, tours['Red Fort'])
+    assert summary(app, user_id) == (2, 600.0, 'Red Fort')
+
+
+def test_create_does_nothing_when_the_row_exists(app, add_user):
+    user_id = add_user('asha')
+    with app.app_context():
+        assert tms.create_booking_summary(user_id) is True
+        assert tms.create_booking_summary(user_id) is False
+        tms.db.session.commit()
+        assert tms.UserBookingSummary.query.filter_by(user_id=user_id).count() == 1
+
+
+def test_missing_row_is_rebuilt_from_existing_bookings(app, user_client, tours, add_booking):
+    user_id = traveller_id(app)
+    add_booking(user_id, tours['Red Fort'], START, persons=3)
+    book(user_client, tours['Tajmahal'])
+    assert summary(app, user_id) == (2, 400.0, 'Tajmahal')
+
+
+def test_cancel_takes_the_booking_out_of_the_summary(app, user_client, tours):
+    user_id = traveller_id(app)
+    first = book(user_client, tours['Tajmahal'], persons=2)
+    second = book(user_client, tours['Red Fort'])
+
+    assert user_client.delete(f'/api/bookings/{second}').status_code == 200
+    assert summary(app, user_id) == (1, 200.0, 'Tajmahal')
+    assert user_client.delete(f'/api/bookings/{first}').status_code == 200
+    assert summary(app, user_id) == (0, 0.0, None)
+
+
+def test_summary_endpoint(app, user_client, admin_client, tours, add_booking):
+    assert admin_client.get('/api/bookings/summary').get_json() == {
+        'booking_count': 0, 'total_spent': 0, 'last_trip': None}
+    add_booking(traveller_id(app), tours['Tajmahal'], START, persons=2, price_per_person=12.345)
+    # No summary row yet, so the endpoint builds it from the bookings
+    assert user_client.get('/api/bookings/summary').get_json() == {
+        'booking_count': 1, 'total_spent': 24.69,
+        'last_trip': {'package_name': 'Tajmahal', 'booking_date': '2025-03-01'}}
+
+
+@pytest.fixture
+def history(app, user_client, tours, add_booking, add_user):
+    """Seven bookings of the traveller, two per day, newest first; and one of someone else"""
+    user_id = traveller_id(app)
+    made = [(add_booking(user_id, tours['Tajmahal'], START + datetime.timedelta(days=i // 2)),
+             START + datetime.timedelta(days=i // 2)) for i in range(7)]
+    add_booking(add_user('asha'), tours['Tajmahal'], START)
+    return sorted(made, key=lambda b: (b[1], b[0]), reverse=True)
+
+
+def walk(client, query, limit):
+    ids, cursor = [], None
+    while True:
+        url = f'/api/bookings/my_history?limit={limit}&{query}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        assert len(page['bookings']) <= limit
+        ids += [b['id'] for b in page['bookings']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def test_history_without_limit_is_the_plain_list(user_client, history):
+    rows = user_client.get('/api/bookings/my_history').get_json()
+    assert [b['id'] for b in rows] == [b[0] for b in history]
+    assert {b['username'] for b in rows} == {'traveller'}
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 100])
+def test_history_pages_cover_every_booking_once(user_client, history, limit):
+    assert walk(user_client, '', limit) == [b[0] for b in history]
+
+
+def test_history_date_filters(user_client, history):
+    day = START + datetime.timedelta(days=1)
+    expected = [b[0] for b in history if b[1] >= day]
+    assert walk(user_client, f'date_from={day:%Y-%m-%d}', 1) == expected
+    expected = [b[0] for b in history if b[1] <= day]
+    assert walk(user_client, f'date_to={day:%Y-%m-%d}', 2) == expected
+
+
+@pytest.mark.parametrize('query', ['date_from=yesterday', 'limit=2&cursor=bm90LWpzb24='])
+def test_history_bad_filter_or_cursor_is_a_400(user_client, history, query):
+    assert user_client.get(f'/api/bookings/my_history?{query}').status_code == 400
@@ -0,0 +1,154 @@
+"""Bulk cancellation: totals, summaries, rollups, released places and one notice per traveller"""
+import datetime
+
+import pytest
+
+import app as tms
+from conftest import booking_payload
+
+SOON = datetime.date.today() + datetime.timedelta(days=10)
+LATER = datetime.date.today() + datetime.timedelta(days=40)
+
+
+@pytest.fixture
+def bookings(add_user, login, admin_client, tours):
+    """Bookings by three travellers; returns [(id, username, tour name, travel date, persons, total)]"""
+    for tour in ('Tajmahal', 'Red Fort'):
+        for day in (SOON, LATER):
+            response = admin_client.put(f'/api/admin/tours/{tours[tour]}/slots',
+                                        json={'date_from': day.isoformat(), 'capacity': 20})
+            assert response.status_code == 200
+    plan = [('asha', 'Tajmahal', SOON, 2, 125.5), ('asha', 'Tajmahal', LATER, 1, 99.99),
+            ('asha', 'Red Fort', SOON, 3, 1200.0), ('ravi', 'Tajmahal', SOON, 4, 250.0),
+            ('ravi', 'Red Fort', LATER, 1, 1200.0), ('meera', 'Red Fort', SOON, 2, 1200.0)]
+    clients, made = {}, []
+    for username, tour, day, persons, price in plan:
+        if username not in clients:
+            add_user(username)
+            clients[username] = login(username)
+        response = clients[username].post('/api/confirm_booking', json=booking_payload(
+            tours[tour], persons=persons, price_per_person=price, total_price=round(price * persons, 2),
+            travel_date=day.isoformat()))
+        assert response.status_code == 200, response.get_json()
+        made.append((response.get_json()['id'], username, tour, day, persons, round(price * persons, 2)))
+    return made
+
+
+def cancel(admin_client, **body):
+    return admin_client.post('/api/admin/bookings/cancel', json=body)
+
+
+def state(app):
+    """Remaining booking ids, summaries by username, package rollup totals and reserved places by slot"""
+    with app.app_context():
+        names = dict(tms.db.session.query(tms.User.id, tms.User.username))
+        summaries = {names[s.user_id]: (s.booking_count, round(s.total_spent, 2), s.last_trip_package)
+                     for s in tms.UserBookingSummary.query}
+        rollups = {r.key: (r.bookings, r.persons, round(r.revenue, 2)) for r in tms.BookingRollup.query.filter_by(
+            period='month', dimension='package') if r.bookings}
+        reserved = {(s.tour_id, s.travel_date): s.reserved for s in tms.TourSlot.query}
+        return sorted(b.id for b in tms.Booking.query), summaries, rollups, reserved
+
+
+def expected_state(bookings, tours, kept):
+    """What state() should read when only `kept` of `bookings` remain"""
+    summaries, rollups = {}, {}
+    for _, username, tour, _, persons, total in sorted(kept):
+        count, spent, _ = summaries.get(username, (0, 0.0, None))
+        summaries[username] = (count + 1, round(spent + total, 2), tour)
+        n, p, r = rollups.get(tour, (0, 0, 0.0))
+        rollups[tour] = (n + 1, p + persons, round(r + total, 2))
+    for username in {b[1] for b in bookings} - summaries.keys():
+        summaries[username] = (0, 0.0, None)
+    reserved = {(tours[tour], day): 0 for tour in ('Tajmahal', 'Red Fort') for day in (SOON, LATER)}
+    for _, _, tour, day, persons, _ in kept:
+        reserved[(tours[tour], day)] += persons
+    return sorted(b[0] for b in kept), summaries, rollups, reserved
+
+
+@pytest.mark.parametrize('chunk_size', [1000, 1])
+def test_cancel_by_tour_reports_totals_and_updates_everything(app, admin_client, bookings, tours, monkeypatch,
+                                                              chunk_size):
+    monkeypatch.setattr(tms, 'BULK_CANCEL_CHUNK_SIZE', chunk_size)
+    response = cancel(admin_client, tour_id=tours['Red Fort'], reason='Monument closed')
+    assert response.status_code == 200
+    body = response.get_json()
+    cancelled = [b for b in bookings if b[2] == 'Red Fort']
+    assert (body['bookings'], body['users']) == (3, 3)
+    assert body['refund_total'] == round(sum(b[5] for b in cancelled), 2) == 7200.0
+    assert body['reason'] == 'Monument closed'
+    assert body['notices'] == {'queued': 3, 'pending': 3, 'sent': 0, 'failed': 0}
+    assert (body['progress'], body['done']) == (0.0, False)
+
+    kept = [b for b in bookings if b[2] != 'Red Fort']
+    assert state(app) == expected_state(bookings, tours, kept)
+
+
+def test_cancel_by_travel_dates_and_ids(app, admin_client, bookings, tours):
+    response = cancel(admin_client, date_from=LATER.isoformat(), date_to=LATER.isoformat())
+    assert response.status_code == 200
+    assert (response.get_json()['bookings'], response.get_json()['users'],
+            response.get_json()['refund_total']) == (2, 2, 1299.99)
+
+    ids = [b[0] for b in bookings if b[1] == 'asha' and b[3] == SOON]
+    response = cancel(admin_client, booking_ids=ids)
+    assert (response.get_json()['bookings'], response.get_json()['users'],
+            response.get_json()['refund_total']) == (2, 1, 3851.0)
+
+    kept = [b for b in bookings if b[3] != LATER and b[0] not in ids]
+    assert state(app) == expected_state(bookings, tours, kept)
+
+
+def test_one_notice_per_traveller_listing_their_bookings(app, admin_client, bookings):
+    response = cancel(admin_client, date_from=SOON.isoformat(), date_to=SOON.isoformat(), reason='Flooding')
+    assert response.get_json()['users'] == 3
+    with app.app_context():
+        notices = {n.to_email: n for n in tms.EmailOutbox.query.filter(tms.EmailOutbox.cancellation_id.isnot(None))}
+        assert sorted(notices) == ['asha@example.com', 'meera@example.com', 'ravi@example.com']
+        assert notices['asha@example.com'].subject == '2 Bookings Cancelled'
+        assert notices['ravi@example.com'].subject == 'Booking Cancelled - Tajmahal'
+        assert 'Flooding' in notices['meera@example.com'].body
+
+
+def test_progress_follows_notice_delivery(app, admin_client, bookings, tours):
+    cancellation_id = cancel(admin_client, tour_id=tours['Tajmahal']).get_json()['id']
+    with app.app_context():
+        first, second = tms.EmailOutbox.query.filter_by(cancellation_id=cancellation_id).order_by(tms.EmailOutbox.id)
+        first.status, second.status = 'sent', 'failed'
+        tms.db.session.commit()
+    progress = admin_client.get(f'/api/admin/bookings/cancellations/{cancellation_id}').get_json()
+    assert progress['notices'] == {'queued': 2, 'pending': 0, 'sent': 1, 'failed': 1}
+    assert (progress['progress'], progress['done']) == (1.0, True)
+
+
+def test_deleting_a_tour_can_cancel_its_upcoming_trips(app, admin_client, bookings, tours):
+    response = admin_client.delete(f"/api/admin/tours/{tours['Tajmahal']}?cancel_bookings=1")
+    assert response.status_code == 200
+    progress = admin_client.get(f"/api/admin/bookings/cancellations/{response.get_json()['cancellation_id']}")
+    assert (progress.get_json()['bookings'], progress.get_json()['refund_total']) == (3, 1350.99)
+    assert state(app)[0] == sorted(b[0] for b in bookings if b[2] != 'Tajmahal')
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'reason': 'No filter'},
+    {'tour_id': 'abc'},
+    {'date_from': '01/01/2030'},
+    {'booking_ids': '1,2'},
+    {'booking_ids': [1, 'two']},
+    {'booking_ids': [1, 2, 3]},
+    {'tour_id': 1, 'reason': 'x' * 301},
+])
+def test_bad_requests_are_a_400_and_cancel_nothing(app, admin_client, bookings, tours, monkeypatch, body):
+    monkeypatch.setattr(tms, 'BULK_CANCEL_MAX_IDS', 2)
+    before = state(app)
+    assert cancel(admin_client, **body).status_code == 400
+    assert state(app) == before
+
+
+def test_nothing_matched_is_a_404(admin_client, bookings):
+    assert cancel(admin_client, booking_ids=[9999]).status_code == 404
+
+
+def test_only_admins_cancel_in_bulk(user_client, bookings, tours):
+    assert cancel(user_client, tour_id=tours['Tajmahal']).status_code == 403
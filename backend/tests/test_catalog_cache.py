@@ -0,0 +1,83 @@
+"""ETags, 304s and catalog version invalidation of the cached tour catalog"""
+from sqlalchemy import update
+
+import app as tms
+
+
+def test_tours_carry_an_etag_and_answer_304_when_it_matches(client):
+    first = client.get('/api/tours')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert len(first.get_json()) == 6
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    cached = client.get('/api/tours', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+
+def test_each_query_has_its_own_etag(client):
+    tours = client.get('/api/tours').headers['ETag']
+    filtered = client.get('/api/packages/filter?locations=Agra').headers['ETag']
+    assert tours != filtered
+    assert client.get('/api/packages/filter?locations=Agra',
+                      headers={'If-None-Match': tours}).status_code == 200
+
+
+def test_admin_write_changes_the_etag_at_once(client, admin_client, tours):
+    etag = client.get('/api/tours').headers['ETag']
+    response = admin_client.put(f"/api/admin/tours/{tours['Tajmahal']}", json={'price': 333.0})
+    assert response.status_code == 200
+
+    fresh = client.get('/api/tours', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert {t['name']: t['price'] for t in fresh.get_json()}['Tajmahal'] == 333.0
+
+
+def test_created_and_deleted_tours_show_up(client, admin_client):
+    response = admin_client.post('/api/admin/tours', json={
+        'name': 'Hampi', 'location': 'Karnataka', 'country': 'India',
+        'description': 'Ruins of Vijayanagara', 'price': 400.0, 'image_path': '/hampi.webp'})
+    assert response.status_code == 201
+    tour_id = response.get_json()['id']
+    assert 'Hampi' in {t['name'] for t in client.get('/api/tours').get_json()}
+
+    assert admin_client.delete(f'/api/admin/tours/{tour_id}').status_code == 200
+    assert 'Hampi' not in {t['name'] for t in client.get('/api/tours').get_json()}
+
+
+def test_write_by_another_worker_is_seen_after_the_version_check(app, client, tours, monkeypatch):
+    etag = client.get('/api/tours').headers['ETag']
+
+    # Another worker changes a tour and bumps the shared version; this
+    # process has not been told and still holds its snapshot.
+    with app.app_context():
+        tms.db.session.execute(update(tms.Tour).where(tms.Tour.id == tours['Tajmahal']).values(price=999.0))
+        tms.bump_cache_version('catalog')
+        tms.db.session.commit()
+    assert client.get('/api/tours', headers={'If-None-Match': etag}).status_code == 304
+
+    monkeypatch.setattr(tms, 'CACHE_VERSION_CHECK_INTERVAL', 0)
+    fresh = client.get('/api/tours', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert {t['name']: t['price'] for t in fresh.get_json()}['Tajmahal'] == 999.0
+
+
+def test_unversioned_database_write_is_not_seen(app, client, tours, monkeypatch):
+    monkeypatch.setattr(tms, 'CACHE_VERSION_CHECK_INTERVAL', 0)
+    etag = client.get('/api/tours').headers['ETag']
+    with app.app_context():
+        tms.db.session.execute(update(tms.Tour).where(tms.Tour.id == tours['Tajmahal']).values(price=999.0))
+        tms.db.session.commit()
+    assert client.get('/api/tours', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_compressed_response_has_its_own_etag(client):
+    plain = client.get('/api/tours')
+    gzipped = client.get('/api/tours', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    assert client.get('/api/tours', headers={'Accept-Encoding': 'gzip',
+                                             'If-None-Match': gzipped.headers['ETag']}).status_code == 304
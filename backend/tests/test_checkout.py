@@ -0,0 +1,128 @@
+"""Idempotent cart checkout: replays, reused keys, price changes, sold-out slots and key expiry"""
+import datetime
+
+import pytest
+
+import app as tms
+
+TRAVEL_DATE = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
+
+
+@pytest.fixture
+def cart(tours):
+    return {'email': 'traveller@example.com', 'mobile': '9000000000', 'payment_mode': 'UPI', 'items': [
+        {'tour_id': tours['Tajmahal'], 'persons': 2, 'price_per_person': 250.0},
+        {'tour_id': tours['Red Fort'], 'persons': 1, 'travel_date': TRAVEL_DATE},
+    ]}
+
+
+def checkout(client, body, key='key-1'):
+    return client.post('/api/checkout', json=body, headers={'Idempotency-Key': key})
+
+
+def counts(app):
+    with app.app_context():
+        return tms.Booking.query.count(), tms.EmailOutbox.query.count()
+
+
+def stored_keys(app):
+    with app.app_context():
+        return sorted(r.idempotency_key for r in tms.CheckoutRequest.query)
+
+
+def test_checkout_books_every_item_at_the_current_price(app, user_client, cart):
+    response = checkout(user_client, cart)
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert len(body['booking_ids']) == 2
+    assert body['total_price'] == 2 * 250.0 + 1200.0
+    assert counts(app) == (2, 1)
+
+
+def test_identical_retry_replays_the_first_response(app, user_client, cart):
+    first = checkout(user_client, cart)
+    again = checkout(user_client, cart)
+    assert again.status_code == 201
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json() == first.get_json()
+    assert counts(app) == (2, 1)
+
+
+def test_key_reused_for_another_cart_is_a_422(app, user_client, cart):
+    assert checkout(user_client, cart).status_code == 201
+    cart['items'][0]['persons'] = 3
+    response = checkout(user_client, cart)
+    assert response.status_code == 422
+    assert counts(app) == (2, 1)
+    assert checkout(user_client, cart, key='key-2').status_code == 201
+
+
+def test_keys_belong_to_their_user(app, user_client, add_user, login, cart):
+    assert checkout(user_client, cart).status_code == 201
+    add_user('asha')
+    assert checkout(login('asha'), cart).status_code == 201
+    assert counts(app) == (4, 2)
+
+
+def test_changed_price_is_a_409_and_the_key_stays_free(app, user_client, cart):
+    cart['items'][0]['price_per_person'] = 200.0
+    response = checkout(user_client, cart)
+    assert response.status_code == 409
+    assert response.get_json()['prices'] == {str(cart['items'][0]['tour_id']): 250.0}
+    assert counts(app) == (0, 0)
+    assert stored_keys(app) == []
+
+    cart['items'][0]['price_per_person'] = 250.0
+    assert checkout(user_client, cart).status_code == 201
+
+
+def test_sold_out_slot_is_a_409_and_books_nothing(app, user_client, admin_client, tours, cart):
+    response = admin_client.put(f"/api/admin/tours/{tours['Red Fort']}/slots",
+                                json={'date_from': TRAVEL_DATE, 'capacity': 0})
+    assert response.status_code == 200
+    response = checkout(user_client, cart)
+    assert response.status_code == 409
+    assert response.get_json()['remaining'] == 0
+    assert counts(app) == (0, 0)
+    assert stored_keys(app) == []
+
+
+def test_unknown_tour_is_a_400(app, user_client, cart):
+    cart['items'][1]['tour_id'] = 9999
+    response = checkout(user_client, cart)
+    assert response.status_code == 400
+    assert counts(app) == (0, 0)
+
+
+def test_missing_key_is_a_400(user_client, cart):
+    assert user_client.post('/api/checkout', json=cart).status_code == 400
+
+
+def expire(app, key):
+    with app.app_context():
+        request = tms.CheckoutRequest.query.filter_by(idempotency_key=key).one()
+        request.created_at -= datetime.timedelta(seconds=tms.CHECKOUT_IDEMPOTENCY_TTL + 1)
+        tms.db.session.commit()
+
+
+def test_expired_key_can_be_used_again(app, user_client, cart):
+    assert checkout(user_client, cart).status_code == 201
+    expire(app, 'key-1')
+    cart['items'][0]['persons'] = 3
+    response = checkout(user_client, cart)
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert counts(app) == (4, 2)
+
+
+@pytest.mark.parametrize('outcome', ['replay', 'price change'])
+def test_expired_keys_are_purged_even_when_nothing_is_booked(app, user_client, cart, outcome):
+    assert checkout(user_client, cart, key='old').status_code == 201
+    assert checkout(user_client, cart, key='recent').status_code == 201
+    expire(app, 'old')
+    if outcome == 'replay':
+        assert checkout(user_client, cart, key='recent').status_code == 201
+    else:
+        cart['items'][0]['price_per_person'] = 1.0
+        assert checkout(user_client, cart, key='new').status_code == 409
+    assert stored_keys(app) == ['recent']
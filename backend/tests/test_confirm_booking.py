@@ -0,0 +1,55 @@
+"""Validation of /api/confirm_booking payloads before anything is saved"""
+import datetime
+
+import pytest
+
+import app as tms
+from conftest import booking_payload
+
+
+def saved(app):
+    with app.app_context():
+        return (tms.Booking.query.count(), tms.UserBookingSummary.query.count(),
+                tms.BookingRollup.query.count(), tms.EmailOutbox.query.count())
+
+
+def test_numbers_sent_as_strings_are_accepted(app, user_client, tours):
+    response = user_client.post('/api/confirm_booking', json=booking_payload(
+        tours['Tajmahal'], persons='2', price_per_person='250', total_price='500.0'))
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        booking = tms.db.session.get(tms.Booking, response.get_json()['id'])
+        assert (booking.persons, booking.price_per_person, booking.total_price) == (2, 250.0, 500.0)
+        assert tms.UserBookingSummary.query.one().total_spent == 500.0
+    summary = user_client.get('/api/bookings/summary').get_json()
+    assert (summary['booking_count'], summary['total_spent']) == (1, 500.0)
+
+
+@pytest.mark.parametrize('fields', [
+    {'persons': 0},
+    {'persons': -1},
+    {'persons': 'two'},
+    {'persons': None},
+    {'persons': ''},
+    {'total_price': 'abc'},
+    {'total_price': -100},
+    {'total_price': None},
+    {'total_price': 'nan'},
+    {'price_per_person': 'abc'},
+    {'price_per_person': -1.5},
+    {'price_per_person': 'inf'},
+    {'price_per_person': [100]},
+])
+@pytest.mark.parametrize('travel_date', [None, 'future'], ids=['no-date', 'dated'])
+def test_bad_numbers_are_a_400_and_save_nothing(app, user_client, tours, fields, travel_date):
+    if travel_date:
+        fields = {**fields, 'travel_date': (datetime.date.today() + datetime.timedelta(days=30)).isoformat()}
+    response = user_client.post('/api/confirm_booking', json=booking_payload(tours['Tajmahal'], **fields))
+    assert response.status_code == 400, response.get_json()
+    assert saved(app) == (0, 0, 0, 0)
+
+
+def test_free_booking_is_allowed(app, user_client, tours):
+    response = user_client.post('/api/confirm_booking', json=booking_payload(
+        tours['Tajmahal'], price_per_person=0, total_price=0))
+    assert response.status_code == 200
@@ -0,0 +1,162 @@
+"""Claiming, retry with backoff and giving up in the email outbox.
+
+SMTP is replaced by a recorder, and the tests drive claim_outbox_batch and
+deliver_outbox_batch directly instead of starting the worker threads.
+"""
+import datetime
+import smtplib
+
+import pytest
+
+import app as tms
+from conftest import booking_payload
+
+
+class FakeSMTP:
+    """Stands in for send_email; fails with the queued errors, in order, then succeeds"""
+
+    def __init__(self):
+        self.sent = []
+        self.errors = []
+
+    def __call__(self, to_email, subject, body, session=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(to_email)
+        return True
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    fake = FakeSMTP()
+    monkeypatch.setattr(tms, 'send_email', fake)
+    return fake
+
+
+def queue(app, *addresses):
+    with app.app_context():
+        messages = [tms.queue_email(address, 'Subject', '<p>Body</p>') for address in addresses]
+        tms.db.session.commit()
+        return [message.id for message in messages]
+
+
+def run_batch(app):
+    """One pass of a worker: claim due messages and deliver them; returns the claimed ids"""
+    with app.app_context():
+        batch = tms.claim_outbox_batch()
+        tms.deliver_outbox_batch(tms.SMTPSession(), batch)
+        return [message.id for message in batch]
+
+
+def message(app, message_id):
+    with app.app_context():
+        return tms.db.session.get(tms.EmailOutbox, message_id)
+
+
+def test_claim_marks_messages_so_no_other_worker_takes_them(app):
+    ids = queue(app, 'a@example.com', 'b@example.com')
+    with app.app_context():
+        first = tms.claim_outbox_batch()
+        assert [m.id for m in first] == ids
+        assert {m.status for m in first} == {'sending'}
+        assert len({m.claim_token for m in first}) == 1
+        assert tms.claim_outbox_batch() == []
+
+
+def test_claim_takes_at_most_a_batch(app, monkeypatch):
+    monkeypatch.setattr(tms, 'EMAIL_BATCH_SIZE', 2)
+    ids = queue(app, *(f'user{i}@example.com' for i in range(5)))
+    with app.app_context():
+        assert [m.id for m in tms.claim_outbox_batch()] == ids[:2]
+        assert [m.id for m in tms.claim_outbox_batch()] == ids[2:4]
+
+
+def test_stale_claim_of_a_dead_worker_is_reclaimed(app):
+    [message_id] = queue(app, 'a@example.com')
+    with app.app_context():
+        [claimed] = tms.claim_outbox_batch()
+        first_token = claimed.claim_token
+        assert tms.claim_outbox_batch() == []
+        claimed.claimed_at -= datetime.timedelta(seconds=tms.EMAIL_CLAIM_TIMEOUT + 1)
+        tms.db.session.commit()
+        [reclaimed] = tms.claim_outbox_batch()
+        assert reclaimed.id == message_id
+        assert reclaimed.claim_token != first_token
+
+
+def test_one_off_mail_is_claimed_before_cancellation_notices(app, monkeypatch):
+    monkeypatch.setattr(tms, 'EMAIL_BATCH_SIZE', 1)
+    with app.app_context():
+        cancellation = tms.BookingCancellation(reason='', bookings=1, users=1, refund_total=0.0)
+        tms.db.session.add(cancellation)
+        tms.db.session.flush()
+        notice = tms.queue_email('bulk@example.com', 'Cancelled', 'body')
+        notice.cancellation_id = cancellation.id
+        tms.db.session.commit()
+        notice_id = notice.id
+    [otp_id] = queue(app, 'otp@example.com')
+    with app.app_context():
+        assert [m.id for m in tms.claim_outbox_batch()] == [otp_id]
+        assert [m.id for m in tms.claim_outbox_batch()] == [notice_id]
+
+
+def test_delivered_message_is_marked_sent(app, smtp):
+    [message_id] = queue(app, 'a@example.com')
+    assert run_batch(app) == [message_id]
+    sent = message(app, message_id)
+    assert (sent.status, sent.attempts) == ('sent', 1)
+    assert sent.sent_at is not None
+    assert smtp.sent == ['a@example.com']
+
+
+def test_failed_send_is_retried_with_exponential_backoff(app, smtp):
+    [message_id] = queue(app, 'a@example.com')
+    for attempt in (1, 2, 3):
+        smtp.errors.append(smtplib.SMTPServerDisconnected('connection lost'))
+        before = datetime.datetime.utcnow()
+        assert run_batch(app) == [message_id]
+        retried = message(app, message_id)
+        assert (retried.status, retried.attempts) == ('pending', attempt)
+        assert retried.last_error == 'connection lost'
+        delay = tms.EMAIL_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+        wait = (retried.next_attempt_at - before).total_seconds()
+        assert delay * 0.8 - 1 <= wait <= delay * 1.2 + 1
+        # Not due yet, so the next pass leaves it alone
+        assert run_batch(app) == []
+        with app.app_context():
+            tms.db.session.get(tms.EmailOutbox, message_id).next_attempt_at = datetime.datetime.utcnow()
+            tms.db.session.commit()
+
+    assert run_batch(app) == [message_id]
+    assert message(app, message_id).status == 'sent'
+    assert smtp.sent == ['a@example.com']
+
+
+def test_gives_up_after_max_attempts(app, smtp, monkeypatch):
+    monkeypatch.setattr(tms, 'EMAIL_RETRY_BASE_DELAY', 0)
+    [message_id] = queue(app, 'a@example.com')
+    smtp.errors.extend(smtplib.SMTPServerDisconnected('down') for _ in range(tms.EMAIL_MAX_ATTEMPTS))
+    for _ in range(tms.EMAIL_MAX_ATTEMPTS):
+        assert run_batch(app) == [message_id]
+    failed = message(app, message_id)
+    assert (failed.status, failed.attempts) == ('failed', tms.EMAIL_MAX_ATTEMPTS)
+    assert run_batch(app) == []
+    assert smtp.sent == []
+
+
+def test_refused_recipient_fails_without_retrying(app, smtp):
+    [message_id] = queue(app, 'nobody@example.com')
+    smtp.errors.append(smtplib.SMTPRecipientsRefused({'nobody@example.com': (550, b'No such user')}))
+    run_batch(app)
+    failed = message(app, message_id)
+    assert (failed.status, failed.attempts) == ('failed', 1)
+    assert run_batch(app) == []
+
+
+def test_booking_queues_its_confirmation_in_the_booking_transaction(app, user_client, tours):
+    response = user_client.post('/api/confirm_booking', json=booking_payload(tours['Tajmahal']))
+    assert response.status_code == 200
+    with app.app_context():
+        [queued] = tms.EmailOutbox.query.all()
+        assert (queued.to_email, queued.status) == ('traveller@example.com', 'pending')
+        assert queued.subject == 'Booking Confirmed - Tajmahal'
@@ -0,0 +1,65 @@
+"""The cached current_user: hits, and invalidation when a user changes their name or password"""
+from sqlalchemy import update
+
+import app as tms
+from conftest import PASSWORD
+
+
+def status(client):
+    return client.get('/api/status').get_json()
+
+
+def test_repeat_requests_are_served_from_the_cache(user_client):
+    status(user_client)
+    before = tms.identity_cache.stats()
+    for _ in range(3):
+        assert status(user_client)['username'] == 'traveller'
+    after = tms.identity_cache.stats()
+    assert after['hits'] - before['hits'] == 3
+    assert after['misses'] == before['misses']
+
+
+def test_username_change_is_seen_on_the_next_request(user_client, login):
+    assert status(user_client)['username'] == 'traveller'
+    response = user_client.post('/api/update_username', json={'new_username': 'wanderer'})
+    assert response.status_code == 200
+    assert status(user_client)['username'] == 'wanderer'
+    login('wanderer')
+
+
+def test_password_change_drops_the_cached_identity(app, user_client, client):
+    status(user_client)
+    with app.app_context():
+        user_id = tms.User.query.filter_by(username='traveller').one().id
+    assert user_id in tms.identity_cache.entries
+
+    response = user_client.post('/api/update_password', json={'new_password': 'changed456'})
+    assert response.status_code == 200
+    assert user_id not in tms.identity_cache.entries
+    assert client.post('/api/login', json={'username': 'traveller', 'password': PASSWORD}).status_code == 401
+    assert client.post('/api/login', json={'username': 'traveller', 'password': 'changed456'}).status_code == 200
+
+
+def test_change_in_another_process_is_seen_after_the_version_check(app, user_client, monkeypatch):
+    status(user_client)
+    # Another worker renames the user and bumps the shared version; this
+    # process keeps its cached identity until it checks the version again.
+    with app.app_context():
+        tms.db.session.execute(update(tms.User).where(tms.User.username == 'traveller').values(username='renamed'))
+        tms.bump_cache_version('identity')
+        tms.db.session.commit()
+    assert status(user_client)['username'] == 'traveller'
+
+    monkeypatch.setattr(tms, 'CACHE_VERSION_CHECK_INTERVAL', 0)
+    assert status(user_client)['username'] == 'renamed'
+
+
+def test_cache_holds_at_most_max_entries(app, add_user, login, monkeypatch):
+    monkeypatch.setattr(tms, 'identity_cache', tms.IdentityCache(max_entries=2))
+    clients = []
+    for name in ('asha', 'ravi', 'meera'):
+        add_user(name)
+        clients.append(login(name))
+        status(clients[-1])
+    assert len(tms.identity_cache.entries) == 2
+    assert [status(c)['username'] for c in clients] == ['asha', 'ravi', 'meera']
@@ -0,0 +1,226 @@
+"""TTL expiry, concurrent access and the entry cap of both OTP stores.
+
+Time comes from a FakeClock handed to the store, so nothing sleeps.
+"""
+import datetime
+import threading
+
+import pytest
+
+import app as tms
+
+TTL = 600
+THREADS = 8
+EMAILS_PER_THREAD = 25
+EPOCH = datetime.datetime(2030, 1, 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def advance(self, seconds):
+        with self.lock:
+            self.seconds += seconds
+
+    def monotonic(self):
+        with self.lock:
+            return self.seconds
+
+    def utcnow(self):
+        return EPOCH + datetime.timedelta(seconds=self.monotonic())
+
+
+def otp_data(email):
+    return {'otp': email[-6:].rjust(6, '0'), 'username': email.split('@')[0][:20], 'phone': '9000000000'}
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, clock, tmp_path):
+        self.store = tms.MemoryOTPStore(ttl=TTL, clock=clock.monotonic)
+
+    def run(self, call):
+        return call()
+
+    def commit(self):
+        pass
+
+    def count(self):
+        return len(self.store.entries)
+
+
+class DatabaseBackend:
+    name = 'database'
+
+    def __init__(self, clock, tmp_path):
+        url = f"sqlite:///{tmp_path / 'otp.db'}"
+        self.app = tms.create_app({
+            'SQLALCHEMY_DATABASE_URI': url,
+            'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+        })
+        with self.app.app_context():
+            tms.db.create_all()
+        self.store = tms.DatabaseOTPStore(ttl=TTL, clock=clock.utcnow)
+
+    def run(self, call):
+        """Run `call` in its own app context and commit, as a request would"""
+        with self.app.app_context():
+            result = call()
+            tms.db.session.commit()
+            return result
+
+    def count(self):
+        with self.app.app_context():
+            return tms.OTPCode.query.count()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=[MemoryBackend, DatabaseBackend], ids=lambda backend: backend.name)
+def backend(request, clock, tmp_path):
+    return request.param(clock, tmp_path)
+
+
+def run_concurrently(backend, workers, sweeps):
+    """Run every worker in its own thread while another keeps sweeping; re-raise the first failure"""
+    errors = []
+    stop = threading.Event()
+    start = threading.Barrier(len(workers) + 1)
+
+    def guarded(target):
+        def run():
+            try:
+                start.wait()
+                target()
+            except BaseException as e:
+                errors.append(e)
+        return run
+
+    def sweeper():
+        while not stop.is_set():
+            sweeps.append(backend.run(backend.store.sweep))
+
+    threads = [threading.Thread(target=guarded(worker)) for worker in workers]
+    sweeping = threading.Thread(target=guarded(sweeper))
+    for thread in threads + [sweeping]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    sweeping.join()
+    if errors:
+        raise errors[0]
+
+
+def thread_emails(index):
+    return [f"user{index}-{n}@example.com" for n in range(EMAILS_PER_THREAD)]
+
+
+def test_entry_expires_after_ttl(backend, clock):
+    backend.run(lambda: backend.store.put('a@example.com', otp_data('a@example.com')))
+    clock.advance(TTL - 1)
+    assert backend.run(lambda: backend.store.get('a@example.com')) == otp_data('a@example.com')
+    clock.advance(1)
+    assert backend.run(lambda: backend.store.get('a@example.com')) is None
+
+
+def test_put_again_restarts_ttl(backend, clock):
+    backend.run(lambda: backend.store.put('a@example.com', otp_data('a@example.com')))
+    clock.advance(TTL - 1)
+    backend.run(lambda: backend.store.put('a@example.com', otp_data('b@example.com')))
+    clock.advance(TTL - 1)
+    assert backend.run(lambda: backend.store.get('a@example.com')) == otp_data('b@example.com')
+
+
+def test_sweep_removes_only_expired_entries(backend, clock):
+    backend.run(lambda: backend.store.put('old@example.com', otp_data('old@example.com')))
+    clock.advance(TTL / 2)
+    backend.run(lambda: backend.store.put('new@example.com', otp_data('new@example.com')))
+    clock.advance(TTL / 2)
+    assert backend.run(backend.store.sweep) == 1
+    assert backend.count() == 1
+    assert backend.run(lambda: backend.store.get('new@example.com')) == otp_data('new@example.com')
+
+
+def test_concurrent_access_during_sweeps(backend, clock):
+    sweeps = []
+
+    def writer(index):
+        def work():
+            for email in thread_emails(index):
+                backend.run(lambda: backend.store.put(email, otp_data(email)))
+                assert backend.run(lambda: backend.store.get(email)) == otp_data(email)
+        return work
+
+    # Live entries survive sweeps running alongside the writers
+    run_concurrently(backend, [writer(i) for i in range(THREADS)], sweeps)
+    assert sum(sweeps) == 0
+    assert backend.count() == THREADS * EMAILS_PER_THREAD
+
+    # Half the threads refresh their entries, then the rest expire
+    clock.advance(TTL / 2)
+    run_concurrently(backend, [writer(i) for i in range(0, THREADS, 2)], sweeps)
+    clock.advance(TTL / 2)
+
+    def reader(index):
+        def work():
+            for email in thread_emails(index):
+                expected = otp_data(email) if index % 2 == 0 else None
+                assert backend.run(lambda: backend.store.get(email)) == expected
+        return work
+
+    run_concurrently(backend, [reader(i) for i in range(THREADS)], sweeps)
+    backend.run(backend.store.sweep)
+    assert backend.count() == THREADS // 2 * EMAILS_PER_THREAD
+
+    clock.advance(TTL)
+    run_concurrently(backend, [reader(i) for i in range(1, THREADS, 2)], sweeps)
+    backend.run(backend.store.sweep)
+    assert backend.count() == 0
+
+
+def test_memory_store_evicts_oldest_beyond_max_entries(clock):
+    store = tms.MemoryOTPStore(ttl=TTL, max_entries=3, clock=clock.monotonic)
+    for email in ('a@x.com', 'b@x.com', 'c@x.com'):
+        store.put(email, otp_data(email))
+    store.put('a@x.com', otp_data('a@x.com'))  # a put moves the entry to the back
+    store.put('d@x.com', otp_data('d@x.com'))
+    assert list(store.entries) == ['c@x.com', 'a@x.com', 'd@x.com']
+    assert store.get('b@x.com') is None
+
+
+def test_memory_store_cap_holds_under_concurrent_puts(clock):
+    store = tms.MemoryOTPStore(ttl=TTL, max_entries=50, clock=clock.monotonic)
+
+    def writer(index):
+        def work():
+            for email in thread_emails(index):
+                store.put(email, otp_data(email))
+                assert len(store.entries) <= 50
+        return work
+
+    backend = MemoryBackend(clock, None)
+    backend.store = store
+    run_concurrently(backend, [writer(i) for i in range(THREADS)], [])
+    assert len(store.entries) == 50
+    assert all(store.get(email) == otp_data(email) for email in store.entries.copy())
+
+
+def test_failed_registration_keeps_the_otp(client):
+    email = 'newcomer@example.com'
+    # The username was taken after the OTP was sent, so the insert fails
+    tms.otp_store.put(email, {'otp': '123456', 'username': 'admin', 'phone': '9111111111'})
+    response = client.post('/api/verify_register', json={'email': email, 'otp': '123456', 'password': 'pw'})
+    assert response.status_code == 500
+    assert tms.otp_store.get(email) is not None
+
+    tms.otp_store.put(email, {'otp': '123456', 'username': 'newcomer', 'phone': '9111111111'})
+    response = client.post('/api/verify_register', json={'email': email, 'otp': '123456', 'password': 'pw'})
+    assert response.status_code == 201
+    assert tms.otp_store.get(email) is None
@@ -0,0 +1,113 @@
+"""Filtering, sorting and cursor pagination of /api/packages/filter, and the facets"""
+import base64
+import json
+
+import pytest
+
+import app as tms
+
+SORTS = {
+    'id': lambda t: t['id'],
+    'price_asc': lambda t: (t['price'], t['id']),
+    'price_desc': lambda t: (-t['price'], t['id']),
+    'name': lambda t: (t['name'].lower(), t['id']),
+}
+
+
+@pytest.fixture
+def catalog(app):
+    """The seeded tours plus two that tie on price with Tajmahal, so sorts need their id tie-break"""
+    with app.app_context():
+        for name in ('Hawa Mahal', 'amber fort'):
+            tms.db.session.add(tms.Tour(name=name, location='Jaipur', country='India', description='',
+                                        price=250.0, image_path='/jaipur.webp'))
+        tms.db.session.add(tms.Tour(name='Pashupatinath', location='Kathmandu', country='Nepal',
+                                    description='', price=300.0, image_path='/nepal.webp'))
+        tms.invalidate_catalog()
+        tms.db.session.commit()
+        tms.catalog_committed()
+        return [tms.tour_to_dict(t) for t in tms.Tour.query.order_by(tms.Tour.id)]
+
+
+def walk(client, query, limit):
+    """Follow next_cursor to the end; returns (tour ids in page order, pages, totals seen)"""
+    ids, pages, totals = [], 0, set()
+    cursor = None
+    while True:
+        url = f'/api/packages/filter?{query}&limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        ids += [t['id'] for t in page['packages']]
+        totals.add(page['total'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids, pages, totals
+
+
+def encode(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+@pytest.mark.parametrize('sort', sorted(SORTS))
+@pytest.mark.parametrize('limit', [1, 2, 4, 100])
+def test_cursor_pages_cover_every_tour_once_in_order(client, catalog, sort, limit):
+    ids, pages, totals = walk(client, f'sort={sort}', limit)
+    assert ids == [t['id'] for t in sorted(catalog, key=SORTS[sort])]
+    assert pages == -(-len(catalog) // limit)
+    assert totals == {len(catalog)}
+
+
+def test_pages_respect_filters_and_price_range(client, catalog):
+    ids, _, totals = walk(client, 'locations=Jaipur,Agra&min_price=200&sort=price_desc', 1)
+    expected = sorted((t for t in catalog if t['location'] in ('Jaipur', 'Agra') and t['price'] >= 200),
+                      key=SORTS['price_desc'])
+    assert ids == [t['id'] for t in expected]
+    assert totals == {3}
+
+
+def test_without_limit_the_response_is_the_plain_list(client, catalog):
+    response = client.get('/api/packages/filter?countries=Nepal')
+    assert [t['name'] for t in response.get_json()] == ['Pashupatinath']
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    'MQ==',                      # the JSON number 1
+    encode({'sort': 'id'}),
+    encode([]),
+    encode(['id']),
+    encode(['id', 'three']),
+    encode(['id', True]),
+    encode(['id', 1, 2]),
+    encode(['price_asc', 250.0, 2]),   # issued for another sort
+    encode(['bogus', 1]),
+])
+def test_malformed_cursor_is_a_400(client, catalog, cursor):
+    response = client.get(f'/api/packages/filter?sort=id&limit=2&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.get_json() == {'message': 'Invalid cursor.'}
+
+
+def test_cursor_from_another_sort_is_a_400(client, catalog):
+    cursor = client.get('/api/packages/filter?sort=price_asc&limit=2').get_json()['next_cursor']
+    assert client.get(f'/api/packages/filter?sort=price_asc&limit=2&cursor={cursor}').status_code == 200
+    for other in ('id', 'price_desc', 'name'):
+        assert client.get(f'/api/packages/filter?sort={other}&limit=2&cursor={cursor}').status_code == 400
+
+
+def test_unknown_sort_is_a_400(client, catalog):
+    response = client.get('/api/packages/filter?sort=rating')
+    assert response.status_code == 400
+    assert response.get_json() == {'message': "Unknown sort 'rating'."}
+
+
+def test_facets_count_each_field_against_the_other_filters(client, catalog):
+    facets = client.get('/api/packages/facets?locations=Jaipur&countries=India').get_json()
+    assert {f['value']: f['count'] for f in facets['locations']}['Jaipur'] == 3
+    assert {f['value']: f['count'] for f in facets['locations']}['Agra'] == 1
+    # Countries are counted within Jaipur only, so Nepal drops out
+    assert {f['value']: f['count'] for f in facets['countries']} == {'India': 3}
+    assert {f['value'] for f in facets['places']} == {'Pink Mahala', 'Hawa Mahal', 'amber fort'}
+    assert facets['price'] == {'min': 150.0, 'max': 1200.0}
@@ -0,0 +1,77 @@
+"""The bounded bcrypt pool: saturation turns logins away with Retry-After, and stale costs are rehashed"""
+import threading
+
+import pytest
+
+import app as tms
+from conftest import PASSWORD
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    """A pool with a single slot in place of the app's"""
+    hasher = tms.PasswordHasher(workers=1, queue_limit=1)
+    monkeypatch.setattr(tms, 'password_hasher', hasher)
+    yield hasher
+    hasher.executor.shutdown()
+
+
+def test_calls_beyond_the_queue_limit_fail_fast(hasher):
+    running, release = threading.Event(), threading.Event()
+
+    def slow():
+        running.set()
+        release.wait(5)
+        return 'done'
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(hasher._run('hash', slow)))
+    worker.start()
+    assert running.wait(5)
+    assert hasher.saturated()
+    with pytest.raises(tms.HashingSaturated):
+        hasher.hash('password')
+    release.set()
+    worker.join()
+    assert results == ['done']
+    assert not hasher.saturated()
+    assert hasher.check(hasher.hash('password'), 'password')
+
+
+def test_login_is_shed_while_the_pool_is_saturated(client, add_user, hasher):
+    add_user('asha')
+    assert hasher.slots.acquire(blocking=False)
+    try:
+        response = client.post('/api/login', json={'username': 'asha', 'password': PASSWORD})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(tms.HASH_RETRY_AFTER)
+        # Browsing does not need the pool
+        assert client.get('/api/tours').status_code == 200
+    finally:
+        hasher.slots.release()
+    assert client.post('/api/login', json={'username': 'asha', 'password': PASSWORD}).status_code == 200
+
+
+def test_saturation_after_the_shed_check_is_still_a_503(client, add_user, hasher, monkeypatch):
+    add_user('asha')
+    monkeypatch.setattr(tms, 'RATE_LIMIT_ENABLED', False)
+    assert hasher.slots.acquire(blocking=False)
+    try:
+        response = client.post('/api/login', json={'username': 'asha', 'password': PASSWORD})
+    finally:
+        hasher.slots.release()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(tms.HASH_RETRY_AFTER)
+
+
+def test_login_rehashes_a_password_of_another_cost(app, add_user, login, monkeypatch):
+    user_id = add_user('asha')
+    monkeypatch.setattr(tms, 'BCRYPT_LOG_ROUNDS', 5)
+    with app.app_context():
+        assert tms.PasswordHasher.needs_rehash(tms.db.session.get(tms.User, user_id).password)
+    login('asha')
+    with app.app_context():
+        stored = tms.db.session.get(tms.User, user_id).password
+    assert stored.split('$')[2] == '05'
+    assert not tms.PasswordHasher.needs_rehash(stored)
+    login('asha')
@@ -0,0 +1,110 @@
+"""Rate limits on login, OTP and contact routes: 429s with Retry-After, per IP, account and email"""
+import pytest
+
+import app as tms
+from conftest import PASSWORD
+
+LOGIN_LIMITS = [('ip', 3, 60), ('account', 2, 300)]
+
+
+@pytest.fixture(params=['memory', 'database'])
+def limited(request, app, add_user, monkeypatch):
+    """Small login limits on either backend, and two users to log in as"""
+    monkeypatch.setattr(tms, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(tms.RATE_LIMITS, 'api.login', LOGIN_LIMITS)
+    monkeypatch.setattr(tms, 'rate_limiter', tms.RATE_LIMITERS[request.param]())
+    add_user('asha')
+    add_user('ravi')
+    return app
+
+
+def log_in(app, username, ip='10.0.0.1', password=PASSWORD):
+    return app.test_client().post('/api/login', json={'username': username, 'password': password},
+                                  environ_base={'REMOTE_ADDR': ip})
+
+
+def test_account_over_its_burst_is_a_429_with_retry_after(limited):
+    assert [log_in(limited, 'asha', ip=f'10.0.0.{i}').status_code for i in range(3)] == [200, 200, 429]
+    response = log_in(limited, 'asha', ip='10.0.0.9')
+    assert response.status_code == 429
+    assert response.get_json()['message'] == "Too many requests. Please try again later."
+    # One token comes back every 300 / 2 seconds
+    assert 0 < int(response.headers['Retry-After']) <= 150
+    assert log_in(limited, 'ravi', ip='10.0.0.9').status_code == 200
+
+
+def test_wrong_passwords_count_too(limited):
+    assert [log_in(limited, 'asha', password='wrong').status_code for _ in range(3)] == [401, 401, 429]
+    assert log_in(limited, 'asha').status_code == 429
+
+
+def test_ip_over_its_burst_is_a_429(limited):
+    assert [log_in(limited, username).status_code for username in ('asha', 'ravi', 'asha', 'ravi')] == [
+        200, 200, 200, 429]
+    assert log_in(limited, 'ravi', ip='10.0.0.2').status_code == 200
+
+
+def test_ip_refusals_do_not_use_up_the_account(limited):
+    for username in ('ravi', 'ravi', 'asha'):
+        assert log_in(limited, username).status_code == 200
+    for _ in range(5):
+        assert log_in(limited, 'asha').status_code == 429
+    # The first login left asha one account token
+    assert log_in(limited, 'asha', ip='10.0.0.2').status_code == 200
+    assert log_in(limited, 'asha', ip='10.0.0.3').status_code == 429
+
+
+def test_usernames_are_limited_regardless_of_case(limited):
+    assert log_in(limited, 'asha').status_code == 200
+    assert log_in(limited, ' ASHA ').status_code == 401
+    assert log_in(limited, 'Asha').status_code == 429
+
+
+def test_send_otp_is_limited_per_email(app, client, monkeypatch):
+    monkeypatch.setattr(tms, 'RATE_LIMIT_ENABLED', True)
+    burst = tms.RATE_LIMITS['api.send_otp'][1][1]
+
+    def send(email):
+        return client.post('/api/send_otp', json={'email': email, 'username': email.split('@')[0],
+                                                  'phone': '9000000001'})
+
+    assert all(send('new@example.com').status_code != 429 for _ in range(burst))
+    response = send('New@Example.com')
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    assert send('other@example.com').status_code != 429
+
+
+def test_contact_form_is_limited_per_ip(app, client, monkeypatch):
+    monkeypatch.setattr(tms, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(tms.RATE_LIMITS, 'api.handle_contact_form', [('ip', 1, 3600)])
+    body = {'name': 'Asha', 'email': 'asha@example.com', 'message': 'Hello'}
+    assert client.post('/api/contact', json=body).status_code != 429
+    response = client.post('/api/contact', json=body)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == 3600
+
+
+def test_limits_can_be_turned_off(limited, monkeypatch):
+    monkeypatch.setattr(tms, 'RATE_LIMIT_ENABLED', False)
+    assert all(log_in(limited, 'asha').status_code == 200 for _ in range(5))
+
+
+@pytest.mark.parametrize('proxy_count', [0, 1])
+def test_forwarded_for_is_trusted_only_behind_a_proxy(app, add_user, monkeypatch, proxy_count):
+    monkeypatch.setattr(tms, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(tms, 'PROXY_COUNT', proxy_count)
+    monkeypatch.setitem(tms.RATE_LIMITS, 'api.login', [('ip', 1, 60)])
+    add_user('asha')
+    client = tms.create_app({key: app.config[key] for key in (
+        'TESTING', 'SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_ENGINE_OPTIONS')}).test_client()
+
+    def log_in(forwarded_for):
+        return client.post('/api/login', json={'username': 'asha', 'password': PASSWORD},
+                           headers={'X-Forwarded-For': forwarded_for}).status_code
+
+    assert log_in('203.0.113.1') == 200
+    # Behind a proxy each forwarded client has its own bucket; without one a
+    # client could pick a fresh address for every request.
+    assert log_in('203.0.113.2') == (200 if proxy_count else 429)
+    assert log_in('203.0.113.2') == 429
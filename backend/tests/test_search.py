@@ -0,0 +1,98 @@
+"""Ranking, typo tolerance and autocomplete of /api/search over the seeded tours"""
+import pytest
+
+import app as tms
+
+
+def search(client, query, **params):
+    response = client.get('/api/search', query_string={'q': query, **params})
+    assert response.status_code == 200
+    return [r['name'] for r in response.get_json()['results']]
+
+
+def suggest(client, prefix, **params):
+    response = client.get('/api/search/autocomplete', query_string={'q': prefix, **params})
+    assert response.status_code == 200
+    return response.get_json()['suggestions']
+
+
+@pytest.fixture
+def hawa_mahal(app):
+    """A second Jaipur tour that mentions 'pink' only in its description"""
+    with app.app_context():
+        tms.db.session.add(tms.Tour(name='Hawa Mahal', location='Jaipur', country='India', price=300.0,
+                                    description='Palace of winds in the pink city', image_path='/hawa.webp'))
+        tms.invalidate_catalog()
+        tms.db.session.commit()
+        tms.catalog_committed()
+
+
+def test_name_matches_rank_above_description_matches(client, hawa_mahal):
+    assert search(client, 'pink') == ['Pink Mahala', 'Hawa Mahal']
+    results = client.get('/api/search?q=pink').get_json()['results']
+    assert results[0]['score'] > results[1]['score']
+
+
+def test_equal_scores_keep_catalog_order(client):
+    assert search(client, 'temple') == ['Cholas Temple', 'Golden Temple']
+
+
+def test_every_word_must_match(client):
+    assert search(client, 'golden temple') == ['Golden Temple']
+    assert search(client, 'golden agra') == []
+
+
+def test_only_the_last_word_matches_as_a_prefix(client):
+    assert search(client, 'golden temp') == ['Golden Temple']
+    assert search(client, 'temp golden') == []
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('tajmahel', ['Tajmahal']),     # substitution
+    ('tempel', ['Cholas Temple', 'Golden Temple']),  # transposition
+    ('dehli', ['Red Fort']),
+    ('pnjab', ['Golden Temple']),   # deletion
+    ('tajmahall', ['Tajmahal']),    # insertion
+])
+def test_one_typo_is_forgiven_in_longer_words(client, query, expected):
+    assert search(client, query) == expected
+
+
+def test_short_words_must_match_exactly(client):
+    assert search(client, 'pnk') == []
+
+
+def test_two_typos_are_not_forgiven(client):
+    assert search(client, 'tjmahell') == []
+
+
+def test_limit_and_empty_queries(client):
+    assert search(client, 'india', limit=2) == ['Ayodhya', 'Tajmahal']
+    assert search(client, '') == []
+    assert search(client, '!!!') == []
+
+
+def test_autocomplete_ranks_by_how_many_tours_use_the_term(client):
+    assert suggest(client, 'te') == [{'text': 'temple', 'tours': 2}]
+    assert [s['text'] for s in suggest(client, 'golden te')] == ['golden temple']
+    assert suggest(client, 'in', limit=1) == [{'text': 'india', 'tours': 6}]
+
+
+def test_autocomplete_falls_back_to_typo_matches(client):
+    assert [s['text'] for s in suggest(client, 'tmple')] == ['temple']
+    assert suggest(client, 'xyz') == []
+
+
+def test_index_follows_catalog_writes(client, admin_client, tours):
+    assert search(client, 'hampi') == []
+    response = admin_client.post('/api/admin/tours', json={
+        'name': 'Hampi', 'location': 'Karnataka', 'country': 'India',
+        'description': 'Ruins of Vijayanagara', 'price': 400.0, 'image_path': '/hampi.webp'})
+    assert response.status_code == 201
+    assert search(client, 'hampi') == ['Hampi']
+    assert [s['text'] for s in suggest(client, 'karn')] == ['karnataka']
+
+    assert admin_client.put(f"/api/admin/tours/{tours['Red Fort']}", json={'location': 'New Delhi'}).status_code == 200
+    assert search(client, 'new delhi') == ['Red Fort']
+    assert admin_client.delete(f"/api/admin/tours/{response.get_json()['id']}").status_code == 200
+    assert search(client, 'hampi') == []
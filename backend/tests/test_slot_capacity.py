@@ -0,0 +1,101 @@
+"""Concurrent bookings against one slot never oversell it, and cancels give the places back"""
+import datetime
+import threading
+
+import pytest
+
+import app as tms
+from conftest import booking_payload
+
+CAPACITY = 10
+TRAVEL_DATE = (datetime.date.today() + datetime.timedelta(days=30)).isoformat()
+
+
+@pytest.fixture
+def slot(app, admin_client, tours):
+    tour_id = tours['Tajmahal']
+    response = admin_client.put(f'/api/admin/tours/{tour_id}/slots',
+                                json={'date_from': TRAVEL_DATE, 'capacity': CAPACITY})
+    assert response.status_code == 200
+    return tour_id
+
+
+@pytest.fixture
+def travellers(add_user, login):
+    """A logged-in client per booker, so every thread has its own cookie jar"""
+    clients = []
+    for i in range(12):
+        add_user(f'booker{i}')
+        clients.append(login(f'booker{i}'))
+    return clients
+
+
+def availability(client, tour_id):
+    [slot] = client.get(f'/api/tours/{tour_id}/availability').get_json()['slots']
+    return slot
+
+
+def book_concurrently(clients, tour_id, persons):
+    """POST one booking per client, all released at once; returns the responses"""
+    start = threading.Barrier(len(clients))
+    responses = [None] * len(clients)
+
+    def book(position, client):
+        start.wait()
+        responses[position] = client.post('/api/confirm_booking', json=booking_payload(
+            tour_id, persons=persons, total_price=100.0 * persons, travel_date=TRAVEL_DATE))
+
+    threads = [threading.Thread(target=book, args=item) for item in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_parallel_bookings_never_exceed_capacity(app, client, slot, travellers):
+    responses = book_concurrently(travellers, slot, persons=3)
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200] * (CAPACITY // 3) + [409] * (len(travellers) - CAPACITY // 3)
+    for response in responses:
+        if response.status_code == 409:
+            assert 0 <= response.get_json()['remaining'] < 3
+
+    assert availability(client, slot) == {'date': TRAVEL_DATE, 'capacity': CAPACITY,
+                                          'reserved': 3 * (CAPACITY // 3), 'remaining': CAPACITY % 3}
+    with app.app_context():
+        assert tms.Booking.query.count() == CAPACITY // 3
+        assert tms.db.session.query(tms.func.sum(tms.Booking.persons)).scalar() == 3 * (CAPACITY // 3)
+
+
+def test_cancel_releases_the_places(client, slot, travellers):
+    responses = book_concurrently(travellers[:5], slot, persons=2)
+    assert [r.status_code for r in responses] == [200] * 5
+    assert availability(client, slot)['remaining'] == 0
+    assert travellers[5].post('/api/confirm_booking', json=booking_payload(
+        slot, persons=1, travel_date=TRAVEL_DATE)).status_code == 409
+
+    assert travellers[0].delete(f"/api/bookings/{responses[0].get_json()['id']}").status_code == 200
+    assert availability(client, slot)['remaining'] == 2
+
+    # Freed places are taken by exactly as many of the waiting bookers
+    retries = book_concurrently(travellers[5:9], slot, persons=1)
+    assert sorted(r.status_code for r in retries) == [200, 200, 409, 409]
+    assert availability(client, slot)['remaining'] == 0
+
+
+def test_bulk_cancel_releases_every_place(client, admin_client, slot, travellers):
+    responses = book_concurrently(travellers[:4], slot, persons=2)
+    assert [r.status_code for r in responses] == [200] * 4
+    assert availability(client, slot)['reserved'] == 8
+
+    response = admin_client.post('/api/admin/bookings/cancel', json={
+        'booking_ids': [r.get_json()['id'] for r in responses[:3]], 'reason': 'Weather'})
+    assert response.status_code == 200
+    assert availability(client, slot)['reserved'] == 2
+
+    response = admin_client.post('/api/admin/bookings/cancel', json={
+        'tour_id': slot, 'date_from': TRAVEL_DATE, 'date_to': TRAVEL_DATE})
+    assert response.status_code == 200
+    assert availability(client, slot) == {'date': TRAVEL_DATE, 'capacity': CAPACITY,
+                                          'reserved': 0, 'remaining': CAPACITY}
@@ -159,7 +159,7 @@ function ManagePlaces({ onPlaceDeleted }) {
 
     const fetchPlaces = async () => {
         try {
-            const response = await fetch('/api/admin/tours');
+            const response = await fetch('/api/admin/tours?fields=id,name,location,country,price,image_path');
             if (response.ok) {
                 const data = await response.json();
                 setPlaces(data);
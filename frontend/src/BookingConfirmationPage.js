@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
+import RelatedTours from './RelatedTours';
 
 const isValidMobile = (number) => {
     return /^\d{10}$/.test(number);
@@ -11,6 +12,7 @@ function BookingConfirmationPage() {
     
     const [email, setEmail] = useState('');
     const [mobile, setMobile] = useState('');
+    const [travelDate, setTravelDate] = useState('');
     const [error, setError] = useState('');
     const [isProcessing, setIsProcessing] = useState(false);
 
@@ -37,6 +39,10 @@ function BookingConfirmationPage() {
             setError('Please enter a valid email address.');
             return;
         }
+        if (!travelDate) {
+            setError('Please choose your travel date.');
+            return;
+        }
 
         setIsProcessing(true);
 
@@ -47,7 +53,9 @@ function BookingConfirmationPage() {
                 body: JSON.stringify({ 
                     email: email, 
                     mobile: mobile, 
+                    tour_id: packageData.id,
                     package_name: packageData.name, 
+                    travel_date: travelDate,
                     total_price: totalPrice,
                     image_filename: imageFilename, 
                     location: packageData.location,
@@ -77,6 +85,13 @@ function BookingConfirmationPage() {
     const handleCancel = () => {
         navigate('/packages');
     };
+
+    // Switch this booking to a recommended tour, keeping persons and payment mode
+    const handleSelectRelated = (tour) => {
+        navigate(`/book/${tour.name.replace(/\s+/g, '-')}`, {
+            state: { ...location.state, package: tour, totalPrice: tour.price * persons }
+        });
+    };
     
     return (
         <div className="dashboard-content confirmation-page-container">
@@ -118,6 +133,14 @@ function BookingConfirmationPage() {
                         maxLength="10"
                         disabled={isProcessing}
                     />
+                    <input 
+                        type="date" 
+                        value={travelDate}
+                        min={new Date().toISOString().split('T')[0]}
+                        onChange={(e) => setTravelDate(e.target.value)}
+                        className="booking-input"
+                        disabled={isProcessing}
+                    />
                 </div>
                 
                 <div className="details-summary">
@@ -160,6 +183,12 @@ function BookingConfirmationPage() {
                         Cancel
                     </button>
                 </div>
+
+                <RelatedTours
+                    title={`Travellers who booked ${packageData.name} also booked`}
+                    url={`/api/tours/${packageData.id}/similar?limit=4`}
+                    onSelect={handleSelectRelated}
+                />
             </div>
         </div>
     );
@@ -3,7 +3,10 @@
 import React from 'react';
 // Reuse the structure from PlacesPage, ensuring required props are passed
 
-function PackageCard({ packageData, onBookClick }) {
+// Uploaded images come with resized variants; plain static paths are used as-is
+const cardImage = (tour) => (tour.image_variants && tour.image_variants[640]) || tour.image;
+
+function PackageCard({ packageData, onBookClick, onSimilarClick }) {
     return (
         <div className="flip-card package-card-item">
             <div className="card-inner">
@@ -13,7 +16,7 @@ function PackageCard({ packageData, onBookClick }) {
                     className="card-front"
                     // FIX: Use backticks (`) for the template literal to correctly interpolate 
                     // the packageData.image URL within the CSS url() function string.
-                    style={{ backgroundImage: `url(${packageData.image})` }}
+                    style={{ backgroundImage: `url(${cardImage(packageData)})` }}
                 >
                     <span className="place-name-front">{packageData.name}</span>
                 </div>
@@ -33,6 +36,11 @@ function PackageCard({ packageData, onBookClick }) {
                         <h4>Total Price:</h4>
                         <p className="price-tag">${packageData.price}</p>
                     </div>
+                    {onSimilarClick && (
+                        <button onClick={() => onSimilarClick(packageData)} className="similar-tours-link">
+                            Show similar tours
+                        </button>
+                    )}
                     
                 </div>
                 
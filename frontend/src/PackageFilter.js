@@ -22,16 +22,12 @@ function PackageFilter({ onFilter }) {
     useEffect(() => {
         const fetchOptions = async () => {
             try {
-                const response = await fetch('/api/tours');
+                const response = await fetch('/api/packages/facets');
                 if (response.ok) {
-                    const tours = await response.json();
+                    const facets = await response.json();
                     
-                    // Extract unique places and countries
-                    const uniquePlaces = [...new Set(tours.map(t => t.name))];
-                    const uniqueCountries = [...new Set(tours.map(t => t.country))];
-                    
-                    setPlaceOptions(uniquePlaces);
-                    setCountryOptions(uniqueCountries);
+                    setPlaceOptions(facets.places.map(f => f.value));
+                    setCountryOptions(facets.countries.map(f => f.value));
                 }
             } catch (error) {
                 console.error('Error fetching filter options:', error);
@@ -3,12 +3,14 @@
 import React, { useState, useEffect } from 'react';
 import PackageFilter from './PackageFilter';
 import PackageCard from './PackageCard';
+import RelatedTours from './RelatedTours';
 import { useNavigate } from 'react-router-dom';
 
 function PackagesPage() {
     const [filteredPackages, setFilteredPackages] = useState([]);
     const [activeFilters, setActiveFilters] = useState({});
     const [loading, setLoading] = useState(false);
+    const [similarTo, setSimilarTo] = useState(null);
     const navigate = useNavigate();
 
     const handleBookTour = (packageData) => {
@@ -77,6 +79,17 @@ function PackagesPage() {
             
             {/* Filter Component */}
             <PackageFilter onFilter={fetchPackages} />
+
+            {/* Recommendations */}
+            {similarTo ? (
+                <RelatedTours
+                    title={`Travellers who booked ${similarTo.name} also booked`}
+                    url={`/api/tours/${similarTo.id}/similar?limit=6`}
+                    onSelect={handleBookTour}
+                />
+            ) : (
+                <RelatedTours title="Popular right now" url="/api/tours/popular?limit=6" onSelect={handleBookTour} />
+            )}
             
             {/* Results */}
             <div className="package-results-grid">
@@ -88,6 +101,7 @@ function PackagesPage() {
                             key={pkg.id}
                             packageData={pkg}
                             onBookClick={handleBookTour}
+                            onSimilarClick={setSimilarTo}
                         />
                     ))
                 ) : (
@@ -2,6 +2,9 @@
 
 import React, { useState, useEffect } from 'react';
 
+// Uploaded images come with resized variants; plain static paths are used as-is
+const cardImage = (tour) => (tour.image_variants && tour.image_variants[640]) || tour.image;
+
 function PlacesPage() {
     const [places, setPlaces] = useState([]);
     const [loading, setLoading] = useState(true);
@@ -53,7 +56,7 @@ function PlacesPage() {
                                     className="card-front"
                                     // FIX: Use backticks (`) for the template literal to correctly interpolate 
                                     // the place.image URL within the CSS url() function string.
-                                    style={{ backgroundImage: `url(${place.image})` }}
+                                    style={{ backgroundImage: `url(${cardImage(place)})` }}
                                 >
                                     <span className="place-name-front">{place.name}</span>
                                 </div>
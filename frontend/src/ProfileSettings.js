@@ -1,20 +1,42 @@
 import React, { useState, useEffect } from 'react';
 import BookingDetailModal from './BookingDetailModal';
 
+const BOOKINGS_PAGE_SIZE = 20;
+
 // Previous Bookings Component
 function PreviousBookings() {
     const [bookings, setBookings] = useState([]);
+    const [summary, setSummary] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [selectedBooking, setSelectedBooking] = useState(null);
     
-    const fetchBookings = async () => {
+    const fetchSummary = async () => {
         try {
-            const response = await fetch('/api/bookings/my_history', {
+            const response = await fetch('/api/bookings/summary', {
+                credentials: 'include'
+            });
+            if (response.ok) {
+                setSummary(await response.json());
+            }
+        } catch (error) {
+            console.error("Failed to fetch booking summary:", error);
+        }
+    };
+
+    const fetchBookings = async (cursor = null) => {
+        try {
+            const query = new URLSearchParams({ limit: BOOKINGS_PAGE_SIZE });
+            if (cursor) {
+                query.set('cursor', cursor);
+            }
+            const response = await fetch(`/api/bookings/my_history?${query}`, {
                 credentials: 'include'
             });
             if (response.ok) {
                 const data = await response.json();
-                setBookings(data);
+                setBookings(previous => cursor ? [...previous, ...data.bookings] : data.bookings);
+                setNextCursor(data.next_cursor);
             } else {
                 console.error("Failed to fetch bookings");
             }
@@ -26,11 +48,13 @@ function PreviousBookings() {
     };
 
     useEffect(() => {
+        fetchSummary();
         fetchBookings();
     }, []);
 
     const handleBookingCancelled = (bookingId) => {
         setBookings(bookings.filter(b => b.id !== bookingId));
+        fetchSummary();
     };
 
     if (loading) {
@@ -40,6 +64,12 @@ function PreviousBookings() {
     return (
         <>
             <h3 className="profile-section-heading">Previous Bookings</h3>
+            {summary && summary.booking_count > 0 && (
+                <p className="booking-summary">
+                    {summary.booking_count} trips booked · ${summary.total_spent} spent
+                    {summary.last_trip && ` · Last trip: ${summary.last_trip.package_name} (${summary.last_trip.booking_date})`}
+                </p>
+            )}
             <div className="previous-bookings-scroll-container">
                 <div className="previous-bookings-list">
                     {bookings.length === 0 ? (
@@ -60,6 +90,11 @@ function PreviousBookings() {
                         ))
                     )}
                 </div>
+                {nextCursor && (
+                    <button type="button" className="load-more-btn" onClick={() => fetchBookings(nextCursor)}>
+                        Load more
+                    </button>
+                )}
             </div>
             
             {selectedBooking && (
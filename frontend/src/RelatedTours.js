@@ -0,0 +1,60 @@
+// frontend/src/RelatedTours.js - "Popular now" and "similar tours" strip
+
+import React, { useState, useEffect } from 'react';
+
+// Uploaded images come with resized variants; plain static paths are used as-is
+const thumbImage = (tour) => (tour.image_variants && tour.image_variants[320]) || tour.image;
+
+// Fetches `/api/tours/popular` or `/api/tours/<id>/similar` and shows the tours
+// as a row of small cards; renders nothing until there is something to show.
+function RelatedTours({ title, url, onSelect }) {
+    const [tours, setTours] = useState([]);
+
+    useEffect(() => {
+        let cancelled = false;
+        const fetchTours = async () => {
+            try {
+                const response = await fetch(url);
+                if (response.ok) {
+                    const data = await response.json();
+                    if (!cancelled) setTours(data.results);
+                } else {
+                    console.error('Failed to fetch related tours');
+                }
+            } catch (error) {
+                console.error('Error fetching related tours:', error);
+            }
+        };
+
+        fetchTours();
+        return () => { cancelled = true; };
+    }, [url]);
+
+    if (tours.length === 0) {
+        return null;
+    }
+
+    return (
+        <div className="related-tours">
+            <h3 className="related-tours-title">{title}</h3>
+            <div className="related-tours-row">
+                {tours.map(tour => (
+                    <button key={tour.id} className="related-tour-item" onClick={() => onSelect(tour)}>
+                        <img
+                            src={thumbImage(tour)}
+                            alt={tour.name}
+                            onError={(e) => {
+                                e.target.onerror = null;
+                                e.target.src = '/Tour.jpg'; // Fallback image
+                            }}
+                        />
+                        <span className="related-tour-name">{tour.name}</span>
+                        <span className="related-tour-price">${tour.price}</span>
+                    </button>
+                ))}
+            </div>
+        </div>
+    );
+}
+
+export default RelatedTours;
@@ -42,6 +42,25 @@ function TourManagementPage() {
         setCurrentTour({ ...currentTour, [e.target.name]: e.target.value });
     };
 
+    // Uploads are stored under a content hash and resized by the backend
+    const handleImageUpload = async (e) => {
+        const file = e.target.files[0];
+        if (!file) return;
+        const formData = new FormData();
+        formData.append('image', file);
+        try {
+            const response = await fetch('/api/admin/images', { method: 'POST', body: formData });
+            const data = await response.json();
+            if (response.ok) {
+                setCurrentTour(tour => ({ ...tour, image_path: data.image_path }));
+            } else {
+                setStatusMessage({ type: 'error', text: data.message || 'Image upload failed.' });
+            }
+        } catch (error) {
+            setStatusMessage({ type: 'error', text: 'Network Error.' });
+        }
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         const method = isEditing ? 'PUT' : 'POST';
@@ -153,6 +172,7 @@ function TourManagementPage() {
                     currentTour={currentTour}
                     isEditing={isEditing}
                     handleChange={handleChange}
+                    handleImageUpload={handleImageUpload}
                     handleSubmit={handleSubmit}
                     onClose={() => setIsModalOpen(false)}
                 />
@@ -163,7 +183,7 @@ function TourManagementPage() {
 export default TourManagementPage;
 
 // --- Modal Component ---
-function TourFormModal({ currentTour, isEditing, handleChange, handleSubmit, onClose }) {
+function TourFormModal({ currentTour, isEditing, handleChange, handleImageUpload, handleSubmit, onClose }) {
     return (
         <div className="filter-modal-backdrop" onClick={onClose}>
             <div className="filter-modal-content tour-modal" onClick={(e) => e.stopPropagation()}>
@@ -177,6 +197,7 @@ function TourFormModal({ currentTour, isEditing, handleChange, handleSubmit, onC
                     <input name="country" value={currentTour.country} onChange={handleChange} placeholder="Country (e.g., India)" required />
                     <input name="price" type="number" value={currentTour.price} onChange={handleChange} placeholder="Price (e.g., 500.00)" required />
                     <input name="image_path" value={currentTour.image_path} onChange={handleChange} placeholder="Image Path (e.g., /ayodhya.webp)" required />
+                    <input type="file" accept="image/jpeg,image/png,image/webp,image/gif,image/avif" onChange={handleImageUpload} />
                     <textarea name="description" value={currentTour.description} onChange={handleChange} placeholder="Description" rows="3" required />
                     <button type="submit" className="form-submit-btn">{isEditing ? 'Save Changes' : 'Create Tour'}</button>
                 </form>